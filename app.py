@@ -1,39 +1,108 @@
-from fastapi import FastAPI, Request, Form, Depends, HTTPException, status
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect, Form, Query, Depends, HTTPException, status
+from fastapi.requests import HTTPConnection
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, StreamingResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from passlib.context import CryptContext
+from sqlalchemy import select, delete, update, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import JWTError, jwt
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
+import asyncio
 import json
+import os
 
-from database import get_db, create_tables, User, Chat, Summary
-from llm_client import chat_with_bot, summarize_conversation
+from database import get_async_db, get_async_read_db, dispose_engines, AsyncSessionLocal, AsyncReadSessionLocal, User, Chat, ChatArchive, Summary, ChatCounter
+from llm_client import (
+    chat_with_bot, stream_chat_with_bot, init_http_client, close_http_client,
+    llm_gateway, llm_routes, LLMOverloaded, MAX_HISTORY_TURNS, MAX_SUMMARIES
+)
+from summary_worker import summary_queue
+from chat_writer import chat_writer, increment_chat_counter, summary_due
+from user_cache import user_cache, UserSnapshot
+from context_cache import context_cache, conversation_stamp, bump_generation
+from memory_index import memory_index
+from crisis_screener import screen_message, crisis_reply
+from chat_search import search_chats
+from chat_archive import chat_archiver, archived_history, archived_cursor_key, iter_archived, forget_blocks
+from static_assets import PrecompressedStaticFiles, asset_manifest, build_assets, ASSETS_URL_PREFIX, STATIC_BUILD_DIR
+from instrumentation import InstrumentationMiddleware, render_metrics, timed
+from passwords import password_hasher, PasswordHasherBusy
+from migrate_db import upgrade_schema, schema_backfills
 
-app = FastAPI(title="Sukoon - Mental Wellness App")
+# Fire-and-forget work started by requests; kept referenced so it isn't GC'd mid-flight
+background_tasks = set()
+
+def spawn_background(coro):
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+_prepared = False
+
+def prepare():
+    """One-off setup shared by every worker: schema upgrades and the fingerprinted assets.
+
+    serve.py runs it once in the master before forking; a plain uvicorn process runs it at startup.
+    """
+    global _prepared
+    if not _prepared:
+        upgrade_schema()
+        asset_manifest.load(build_assets())
+        _prepared = True
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    prepare()
+    # Data backfills trickle in the background; per-process clients and pools start here, after any fork
+    schema_backfills.start()
+    # One pooled keep-alive client shared by all LLM calls
+    await init_http_client()
+    await summary_queue.start()
+    await chat_writer.start()
+    await chat_archiver.start()
+    app.state.ready = True
+    yield
+    app.state.ready = False
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    await chat_archiver.stop()
+    schema_backfills.stop()
+    # Drain buffered chats before the summary queue they may enqueue into stops
+    await chat_writer.stop()
+    await summary_queue.stop()
+    await close_http_client()
+    await dispose_engines()
+    password_hasher.shutdown()
+
+app = FastAPI(title="Sukoon - Mental Wellness App", lifespan=lifespan)
+app.add_middleware(InstrumentationMiddleware)
+# /readyz fails until startup finishes and while serve.py drains a worker
+app.state.ready = False
+app.state.draining = False
 
 # Security
 SECRET_KEY = "your-secret-key-change-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
-# Static files and templates
+# Static files and templates; fingerprinted copies are built by prepare()
 app.mount("/static", StaticFiles(directory="static"), name="static")
+app.mount(ASSETS_URL_PREFIX, PrecompressedStaticFiles(directory=STATIC_BUILD_DIR, check_dir=False), name="assets")
 templates = Jinja2Templates(directory="templates")
+templates.env.globals["asset_url"] = asset_manifest.url
 
-# Create database tables
-create_tables()
+@app.exception_handler(LLMOverloaded)
+async def llm_overloaded_handler(request: Request, exc: LLMOverloaded):
+    return JSONResponse({"detail": str(exc)}, status_code=503, headers={"Retry-After": str(exc.retry_after)})
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_password_hash(password):
-    return pwd_context.hash(password)
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusy):
+    # Backpressure: shed login/signup bursts instead of queueing unbounded bcrypt work
+    return JSONResponse({"detail": str(exc)}, status_code=503, headers={"Retry-After": "2"})
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
@@ -45,23 +114,38 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user(request: Request, db: Session = Depends(get_db)):
+def get_token_subject(request: HTTPConnection):
     token = request.cookies.get("access_token")
     if not token:
         return None
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            return None
     except JWTError:
         return None
-    
-    user = db.query(User).filter(User.username == username).first()
-    return user
+    return payload.get("sub")
+
+async def get_current_user(request: HTTPConnection):
+    with timed("auth"):
+        username = get_token_subject(request)
+        if username is None:
+            return None
+        
+        # Hot path: no DB round-trip once the user is cached
+        user = user_cache.get(username)
+        if user is None:
+            async with AsyncSessionLocal() as db:
+                db_user = await db.scalar(select(User).where(User.username == username))
+            if db_user is None:
+                return None
+            user = UserSnapshot.from_user(db_user)
+            # has_assessment is the only snapshot field that changes after signup, and only
+            # once; caching just assessed users keeps every worker's copy correct
+            if user.has_assessment:
+                user_cache.put(username, user)
+        return user
 
 @app.get("/", response_class=HTMLResponse)
-async def root(request: Request, current_user: User = Depends(get_current_user)):
+async def root(request: Request, current_user: UserSnapshot = Depends(get_current_user)):
     if current_user:
         return RedirectResponse(url="/chat", status_code=302)
     return templates.TemplateResponse("login.html", {"request": request})
@@ -78,7 +162,7 @@ async def signup(
     password: str = Form(...),
     age: int = Form(...),
     gender: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # Validate age
     if age < 1 or age > 120:
@@ -88,14 +172,14 @@ async def signup(
         })
     
     # Check if user exists (by email)
-    if db.query(User).filter(User.email == email).first():
+    if await db.scalar(select(User).where(User.email == email)):
         return templates.TemplateResponse("signup.html", {
             "request": request, 
             "error": "Email already exists"
         })
     
     # Create user
-    hashed_password = get_password_hash(password)
+    hashed_password = await password_hasher.hash(password)
     user = User(
         username=email,  # Use email as username for login
         email=email,
@@ -105,8 +189,8 @@ async def signup(
         password_hash=hashed_password
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    user_cache.invalidate(user.username)
     
     # Create access token and redirect to assessment
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -127,16 +211,22 @@ async def login(
     request: Request,
     username: str = Form(...),  # This will actually be email from the form
     password: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # Look up user by email (which comes in as 'username' from the form)
-    user = db.query(User).filter(User.email == username).first()
-    if not user or not verify_password(password, user.password_hash):
+    user = await db.scalar(select(User).where(User.email == username))
+    valid, new_hash = (await password_hasher.verify_and_update(password, user.password_hash)) if user else (False, None)
+    if not valid:
         return templates.TemplateResponse("login.html", {
             "request": request,
             "error": "Invalid email or password"
         })
     
+    # Transparently upgrade hashes made with a different bcrypt cost
+    if new_hash:
+        user.password_hash = new_hash
+        await db.commit()
+    
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": user.username}, expires_delta=access_token_expires
@@ -147,18 +237,22 @@ async def login(
     return response
 
 @app.get("/logout")
-async def logout():
+async def logout(request: Request):
+    username = get_token_subject(request)
+    if username is not None:
+        user_cache.invalidate(username)
+    
     response = RedirectResponse(url="/", status_code=302)
     response.delete_cookie(key="access_token")
     return response
 
 @app.get("/assessment", response_class=HTMLResponse)
-async def assessment_page(request: Request, current_user: User = Depends(get_current_user)):
+async def assessment_page(request: Request, current_user: UserSnapshot = Depends(get_current_user)):
     if not current_user:
         return RedirectResponse(url="/login", status_code=302)
     
     # If already completed assessment, redirect to chat
-    if current_user.assessment_data:
+    if current_user.has_assessment:
         return RedirectResponse(url="/chat", status_code=302)
     
     return templates.TemplateResponse("assessment.html", {"request": request})
@@ -166,8 +260,8 @@ async def assessment_page(request: Request, current_user: User = Depends(get_cur
 @app.post("/assessment")
 async def submit_assessment(
     request: Request,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     if not current_user:
         return RedirectResponse(url="/login", status_code=302)
@@ -187,8 +281,11 @@ async def submit_assessment(
     crisis_detected = assessment_data.get("self_harm") in ["several_days", "more_than_half", "nearly_every_day"]
     
     # Save assessment
-    current_user.assessment_data = assessment_data
-    db.commit()
+    await db.execute(
+        update(User).where(User.id == current_user.id).values(assessment_data=assessment_data)
+    )
+    await db.commit()
+    user_cache.invalidate(current_user.username)
     
     if crisis_detected:
         return templates.TemplateResponse("crisis.html", {"request": request})
@@ -196,18 +293,98 @@ async def submit_assessment(
     return RedirectResponse(url="/chat", status_code=302)
 
 @app.get("/chat", response_class=HTMLResponse)
-async def chat_page(request: Request, current_user: User = Depends(get_current_user)):
+async def chat_page(request: Request, current_user: UserSnapshot = Depends(get_current_user)):
     if not current_user:
         return RedirectResponse(url="/login", status_code=302)
     
     return templates.TemplateResponse("chat.html", {"request": request, "user": current_user})
 
+async def save_chat_and_summarize(db: AsyncSession, user_id: int, bot: str, message: str, reply: str, via_call: bool):
+    """Persist a completed exchange and queue a summary refresh every 8 messages"""
+    chat_record = Chat(
+        user_id=user_id,
+        bot=bot,
+        message=message,
+        reply=reply,
+        via_call=via_call,
+        timestamp=datetime.utcnow()
+    )
+    context_cache.add_turn(user_id, bot, chat_record)
+    
+    if chat_writer.enabled:
+        # Write-behind: committed with the next batch, which also queues due summaries
+        chat_writer.add(chat_record)
+        return chat_record
+    
+    with timed("db_insert"):
+        db.add(chat_record)
+        total_messages = await increment_chat_counter(db, user_id, bot)
+        await db.commit()
+    context_cache.committed(user_id, bot, total_messages)
+    
+    # Auto-generate summary after every 8 messages for personalization;
+    # the background worker does the LLM round-trip off the request path
+    if summary_due(total_messages):
+        await summary_queue.enqueue(user_id, bot)
+    
+    return chat_record
+
+async def load_conversation_context(db: AsyncSession, user_id: int, bot: str, message: str = None):
+    """Recent turns (oldest first) and summaries for prompting.
+
+    With a message and the memory index enabled, summaries are the ones most
+    relevant to it; otherwise the latest ones, newest first.
+    """
+    # Steady state is served from memory; saves and summaries write through. The stamp
+    # is one primary-key read that tells whether another worker changed the conversation
+    with timed("context_stamp"):
+        stamp = await conversation_stamp(db, user_id, bot)
+    cached = context_cache.get(user_id, bot, stamp)
+    if cached is None:
+        # The miss path reads the database, so commit this user's buffered turns first
+        await chat_writer.flush_for(user_id)
+        stamp = await conversation_stamp(db, user_id, bot)
+        cached = await fetch_conversation_context(db, user_id, bot, stamp)
+    recent_chats, user_summaries = cached
+    if message is not None and memory_index.enabled:
+        user_summaries = await memory_index.relevant(db, user_id, bot, message, generation=stamp[1])
+    return recent_chats, user_summaries
+
+async def fetch_conversation_context(db: AsyncSession, user_id: int, bot: str, stamp: tuple):
+    """Load a context-cache miss: recent turns oldest first, latest summaries newest first"""
+    # Get recent conversation history
+    with timed("history_fetch"):
+        recent_chats = (await db.scalars(
+            select(Chat).where(
+                Chat.user_id == user_id,
+                Chat.bot == bot
+            ).order_by(Chat.timestamp.desc()).limit(MAX_HISTORY_TURNS)
+        )).all()
+    recent_chats.reverse()  # Oldest first
+    
+    # Get user summaries for personalization
+    with timed("summary_fetch"):
+        user_summaries = (await db.scalars(
+            select(Summary).where(
+                Summary.user_id == user_id,
+                Summary.bot == bot
+            ).order_by(Summary.created_at.desc()).limit(MAX_SUMMARIES)
+        )).all()
+    
+    context_cache.put(user_id, bot, recent_chats, user_summaries, stamp)
+    return recent_chats, user_summaries
+
+def sse_event(data: dict, event: str = None):
+    """Format one Server-Sent Event"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
 @app.post("/chat/{bot}")
 async def chat_with_bot_endpoint(
     bot: str,
     request: Request,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     if not current_user:
         raise HTTPException(status_code=401, detail="Not authenticated")
@@ -218,80 +395,269 @@ async def chat_with_bot_endpoint(
     data = await request.json()
     message = data.get("message", "").strip()
     via_call = data.get("via_call", False)
+    stream = data.get("stream", False)
     
     if not message:
         raise HTTPException(status_code=400, detail="Message cannot be empty")
     
+    # Risky messages get crisis resources at once, even if OpenRouter is slow or down
+    if screen_crisis(message):
+        reply = crisis_reply(message)
+        spawn_background(follow_up_crisis_reply(current_user.id, bot, message, via_call, reply))
+        if stream:
+            return StreamingResponse(
+                iter([sse_event({"done": True, "reply": reply, "crisis": True})]),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
+        return JSONResponse({"reply": reply, "crisis": True})
+    
     try:
-        # Get recent conversation history
-        recent_chats = db.query(Chat).filter(
-            Chat.user_id == current_user.id,
-            Chat.bot == bot
-        ).order_by(Chat.timestamp.desc()).limit(6).all()
-        recent_chats.reverse()  # Oldest first
+        recent_chats, user_summaries = await load_conversation_context(db, current_user.id, bot, message)
         
-        # Get user summaries for personalization
-        user_summaries = db.query(Summary).filter(
-            Summary.user_id == current_user.id,
-            Summary.bot == bot
-        ).order_by(Summary.created_at.desc()).limit(3).all()
+        if stream:
+            # Prime the generator so queue rejection surfaces as a real 503
+            events = await start_stream(
+                stream_chat_reply(current_user.id, bot, message, via_call, recent_chats, user_summaries)
+            )
+            return StreamingResponse(
+                events,
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
         
-        # Get bot response with personalization
-        reply = await chat_with_bot(bot, message, recent_chats, user_summaries)
+        # Get bot response with personalization (history trimmed to the token budget)
+        usage = {}
+        async with llm_gateway.slot(current_user.id):
+            reply = await chat_with_bot(bot, message, recent_chats, user_summaries, usage)
         
         # Save conversation
-        chat_record = Chat(
-            user_id=current_user.id,
-            bot=bot,
-            message=message,
-            reply=reply,
-            via_call=via_call
-        )
-        db.add(chat_record)
-        db.commit()
-        
-        # Auto-generate summary after every 8 messages for personalization
-        total_messages = db.query(Chat).filter(
-            Chat.user_id == current_user.id,
-            Chat.bot == bot
-        ).count()
+        await save_chat_and_summarize(db, current_user.id, bot, message, reply, via_call)
         
-        if total_messages % 8 == 0 and total_messages > 0:
-            try:
-                # Get recent conversation for summary
-                summary_chats = db.query(Chat).filter(
-                    Chat.user_id == current_user.id,
-                    Chat.bot == bot
-                ).order_by(Chat.timestamp.desc()).limit(8).all()
-                summary_chats.reverse()
-                
-                # Generate summary for personalization
-                summary_text = await summarize_conversation(bot, summary_chats)
-                
-                # Save summary
-                summary = Summary(
-                    user_id=current_user.id,
-                    bot=bot,
-                    summary_text=summary_text
-                )
-                db.add(summary)
-                db.commit()
-                
-            except Exception as summary_error:
-                # Don't fail the chat if summary fails
-                print(f"Auto-summary failed: {summary_error}")
-        
-        return JSONResponse({"reply": reply})
+        return JSONResponse({"reply": reply, "prompt_tokens": usage.get("prompt_tokens")})
         
+    except LLMOverloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def screen_crisis(message: str) -> bool:
+    with timed("crisis_screen"):
+        return screen_message(message) is not None
+
+async def follow_up_crisis_reply(user_id: int, bot: str, message: str, via_call: bool, template: str):
+    """Persist a screened exchange, then append the bot's own reply once the LLM answers"""
+    async with AsyncSessionLocal() as db:
+        # Load context before saving so the LLM doesn't see this message twice
+        recent_chats, user_summaries = await load_conversation_context(db, user_id, bot, message)
+        chat_record = await save_chat_and_summarize(db, user_id, bot, message, template, via_call)
+    
+    try:
+        async with llm_gateway.slot(user_id):
+            follow_up = await chat_with_bot(bot, message, recent_chats, user_summaries)
+    except Exception as e:
+        print(f"Crisis follow-up failed, keeping the templated reply: {e}")
+        return
+    
+    if chat_record.id is None:
+        await chat_writer.flush()
+    async with AsyncSessionLocal() as db:
+        await db.execute(update(Chat).where(Chat.id == chat_record.id).values(reply=f"{template}\n\n{follow_up}"))
+        await bump_generation(db, user_id, bot)
+        await db.commit()
+    context_cache.invalidate(user_id, bot)
+
+async def start_stream(events):
+    """Run an async generator up to its first chunk, then hand back the full stream"""
+    first = await events.__anext__()
+    
+    async def relay():
+        yield first
+        async for chunk in events:
+            yield chunk
+    
+    return relay()
+
+async def stream_chat_reply(user_id: int, bot: str, message: str, via_call: bool, recent_chats: list, user_summaries: list):
+    """Relay LLM deltas as SSE and persist the full reply before the final "done" event"""
+    await llm_gateway.acquire(user_id)
+    parts = []
+    usage = {}
+    try:
+        yield ": admitted\n\n"
+        try:
+            async for delta in stream_chat_with_bot(bot, message, recent_chats, user_summaries, usage):
+                parts.append(delta)
+                yield sse_event({"delta": delta})
+        except Exception as e:
+            yield sse_event({"detail": str(e)}, event="error")
+            return
+    finally:
+        llm_gateway.release()
+    
+    reply = "".join(parts)
+    # Persist before "done": a client that leaves once it renders the reply cancels this
+    # generator at the next yield. The request-scoped session may already be closed; use a fresh one
+    async with AsyncSessionLocal() as db:
+        await save_chat_and_summarize(db, user_id, bot, message, reply, via_call)
+    yield sse_event({"done": True, "reply": reply, "prompt_tokens": usage.get("prompt_tokens")})
+
+
+# Close sockets that miss heartbeats (the client pings every 25s)
+WS_IDLE_TIMEOUT_SECONDS = float(os.environ.get("WS_IDLE_TIMEOUT_SECONDS", 60))
+
+@app.websocket("/ws/chat/{bot}")
+async def chat_websocket(websocket: WebSocket, bot: str):
+    """Chat over one socket: auth and history load happen once per connection"""
+    current_user = await get_current_user(websocket)
+    # Accept before closing: a close during the handshake reaches the browser as a bare
+    # 403 (close code 1006), and the client needs 4401/4400 to know not to reconnect
+    await websocket.accept()
+    if not current_user or bot not in ["aarav", "meera"]:
+        await websocket.close(code=4401 if not current_user else 4400)
+        return
+    
+    try:
+        while True:
+            try:
+                data = await asyncio.wait_for(websocket.receive_json(), timeout=WS_IDLE_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                await websocket.close(code=1001)
+                return
+            except (json.JSONDecodeError, KeyError):
+                # Invalid JSON, or a binary frame (no "text"); the socket itself is fine
+                data = None
+            if not isinstance(data, dict):
+                await websocket.send_json({"type": "error", "detail": "Malformed message"})
+                continue
+            
+            if data.get("type") == "ping":
+                await websocket.send_json({"type": "pong"})
+                continue
+            
+            message = (data.get("message") or "").strip()
+            if not message:
+                await websocket.send_json({"type": "error", "detail": "Message cannot be empty"})
+                continue
+            
+            via_call = bool(data.get("via_call"))
+            if screen_crisis(message):
+                reply = crisis_reply(message)
+                spawn_background(follow_up_crisis_reply(current_user.id, bot, message, via_call, reply))
+                await websocket.send_json({"type": "done", "reply": reply, "crisis": True})
+                continue
+            
+            # The context cache keeps this in step with saves and new summaries
+            async with AsyncSessionLocal() as db:
+                recent_chats, user_summaries = await load_conversation_context(db, current_user.id, bot, message)
+            await relay_socket_reply(websocket, current_user.id, bot, message, via_call, recent_chats, user_summaries)
+    except WebSocketDisconnect:
+        pass
+
+async def relay_socket_reply(websocket: WebSocket, user_id: int, bot: str, message: str, via_call: bool, recent_chats: list, user_summaries: list):
+    """Stream one reply over the socket; returns the saved Chat, or None on failure"""
+    parts = []
+    usage = {}
+    try:
+        async with llm_gateway.slot(user_id):
+            async for delta in stream_chat_with_bot(bot, message, recent_chats, user_summaries, usage):
+                parts.append(delta)
+                await websocket.send_json({"type": "delta", "delta": delta})
+    except LLMOverloaded as e:
+        await websocket.send_json({"type": "error", "detail": str(e), "retry_after": e.retry_after})
+        return None
+    except WebSocketDisconnect:
+        raise
+    except Exception as e:
+        await websocket.send_json({"type": "error", "detail": str(e)})
+        return None
+    
+    reply = "".join(parts)
+    # Persist before "done" so a history fetch right after sees this turn
+    async with AsyncSessionLocal() as db:
+        chat_record = await save_chat_and_summarize(db, user_id, bot, message, reply, via_call)
+    await websocket.send_json({"type": "done", "reply": reply, "prompt_tokens": usage.get("prompt_tokens")})
+    return chat_record
+
+@app.get("/api/llm/metrics")
+async def llm_metrics():
+    return JSONResponse(dict(llm_gateway.metrics(), routes=[route.metrics() for route in llm_routes]))
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    gateway = llm_gateway.metrics()
+    cache = context_cache.metrics()
+    gauges = {
+        "sukoon_llm_active": (gateway["active"], "LLM calls in flight"),
+        "sukoon_llm_queue_depth": (gateway["queue_depth"], "Requests waiting for an LLM slot"),
+        "sukoon_llm_admitted_total": (gateway["admitted_total"], "LLM calls admitted since start"),
+        "sukoon_llm_rejected_total": (gateway["rejected_total"], "LLM calls shed with 503 since start"),
+        "sukoon_context_cache_hit_rate": (cache["hit_rate"], "Conversation context cache hit rate"),
+        "sukoon_context_cache_bytes": (cache["bytes"], "Approximate conversation context cache size"),
+        "sukoon_summary_queue_depth": (summary_queue.depth(), "Summary jobs waiting or running"),
+        "sukoon_chat_write_pending": (chat_writer.pending(), "Chat rows buffered for the next write-behind flush"),
+        "sukoon_chat_archived_total": (chat_archiver.metrics()["rows_archived"], "Chat rows compacted into archive blocks since start")
+    }
+    return PlainTextResponse(render_metrics(gauges), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/cache/metrics")
+async def cache_metrics():
+    return JSONResponse({"context": context_cache.metrics(), "memory": memory_index.metrics()})
+
+@app.get("/readyz")
+async def readiness():
+    """Load balancer readiness: 503 while starting, draining, or without a database"""
+    if app.state.draining or not app.state.ready:
+        state = "draining" if app.state.draining else "starting"
+        return JSONResponse({"status": state, "pid": os.getpid()}, status_code=503)
+    try:
+        async with AsyncSessionLocal() as db:
+            await db.execute(text("SELECT 1"))
+    except Exception as e:
+        return JSONResponse({"status": "database unavailable", "detail": str(e), "pid": os.getpid()}, status_code=503)
+    return JSONResponse({"status": "ready", "pid": os.getpid()})
+
+
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 200
+SEARCH_PAGE_SIZE = 20
+
+def serialize_chat(chat: Chat) -> dict:
+    return {
+        "id": chat.id,
+        "message": chat.message,
+        "reply": chat.reply,
+        "timestamp": chat.timestamp.isoformat(),
+        "via_call": chat.via_call
+    }
+
+async def history_cursor_key(db: AsyncSession, user_id: int, bot: str, before: int):
+    """(timestamp, id) of the cursor chat, which may since have been archived"""
+    cursor_timestamp = await db.scalar(
+        select(Chat.timestamp).where(Chat.id == before, Chat.user_id == user_id)
+    )
+    if cursor_timestamp is not None:
+        return cursor_timestamp, before
+    cursor_key = await archived_cursor_key(db, user_id, bot, before)
+    if cursor_key is None:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return cursor_key
+
+def chat_history_query(user_id: int, bot: str, before_key: tuple = None):
+    """Newest-first live history for (user, bot), keyset-paginated on (timestamp, id)"""
+    query = select(Chat).where(Chat.user_id == user_id, Chat.bot == bot)
+    if before_key is not None:
+        query = query.where(tuple_(Chat.timestamp, Chat.id) < before_key)
+    return query.order_by(Chat.timestamp.desc(), Chat.id.desc())
 
 @app.get("/api/chats/{bot}")
 async def get_chats(
     bot: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    before: int = None,
+    limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=HISTORY_MAX_PAGE_SIZE),
+    format: str = "json",
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     if not current_user:
         raise HTTPException(status_code=401, detail="Not authenticated")
@@ -299,23 +665,65 @@ async def get_chats(
     if bot not in ["aarav", "meera"]:
         raise HTTPException(status_code=400, detail="Invalid bot")
     
-    chats = db.query(Chat).filter(
-        Chat.user_id == current_user.id,
-        Chat.bot == bot
-    ).order_by(Chat.timestamp.asc()).all()
+    # Read-your-writes: commit this user's buffered chats before querying
+    await chat_writer.flush_for(current_user.id)
+    before_key = await history_cursor_key(db, current_user.id, bot, before) if before is not None else None
     
-    return JSONResponse([{
-        "message": chat.message,
-        "reply": chat.reply,
-        "timestamp": chat.timestamp.isoformat(),
-        "via_call": chat.via_call
-    } for chat in chats])
+    if format == "ndjson":
+        # Full export: stream rows off a server-side cursor instead of building a list
+        query = chat_history_query(current_user.id, bot, before_key)
+        return StreamingResponse(stream_chat_history(query, current_user.id, bot, before_key), media_type="application/x-ndjson")
+    
+    chats = await chat_history_page(db, current_user.id, bot, before_key, limit)
+    next_cursor = chats[-1]["id"] if len(chats) == limit else None
+    
+    return JSONResponse({
+        "chats": chats,
+        "next_cursor": next_cursor
+    })
+
+async def chat_history_page(db: AsyncSession, user_id: int, bot: str, before_key: tuple, limit: int) -> list:
+    query = chat_history_query(user_id, bot, before_key)
+    chats = [serialize_chat(chat) for chat in (await db.scalars(query.limit(limit))).all()]
+    if len(chats) < limit:
+        # Past the live rows: older turns continue in the compacted archive blocks
+        chats += await archived_history(db, user_id, bot, before_key, limit - len(chats))
+    return chats
+
+@app.get("/api/chats/{bot}/search")
+async def search_chat_history(
+    bot: str,
+    q: str = Query(..., min_length=1, max_length=200),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(SEARCH_PAGE_SIZE, ge=1, le=HISTORY_MAX_PAGE_SIZE),
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    if not current_user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    if bot not in ["aarav", "meera"]:
+        raise HTTPException(status_code=400, detail="Invalid bot")
+    
+    await chat_writer.flush_for(current_user.id)
+    results = await search_chats(db, current_user.id, bot, q, limit, offset)
+    next_offset = offset + limit if len(results) == limit else None
+    
+    return JSONResponse({"results": results, "next_offset": next_offset})
+
+async def stream_chat_history(query, user_id: int, bot: str, before_key: tuple = None):
+    async with AsyncReadSessionLocal() as db:
+        result = await db.stream_scalars(query.execution_options(yield_per=100))
+        async for chat in result:
+            yield json.dumps(serialize_chat(chat)) + "\n"
+        async for row in iter_archived(db, user_id, bot, before_key):
+            yield json.dumps(row) + "\n"
 
 @app.post("/api/delete_chats/{bot}")
 async def delete_chats(
     bot: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     if not current_user:
         raise HTTPException(status_code=401, detail="Not authenticated")
@@ -323,29 +731,45 @@ async def delete_chats(
     if bot not in ["aarav", "meera"]:
         raise HTTPException(status_code=400, detail="Invalid bot")
     
-    # Delete chats and summaries
-    db.query(Chat).filter(Chat.user_id == current_user.id, Chat.bot == bot).delete()
-    db.query(Summary).filter(Summary.user_id == current_user.id, Summary.bot == bot).delete()
-    db.commit()
+    # Delete chats and summaries (buffered chats first, so they can't reappear)
+    await chat_writer.flush_for(current_user.id)
+    await db.execute(delete(Chat).where(Chat.user_id == current_user.id, Chat.bot == bot))
+    await db.execute(delete(ChatArchive).where(ChatArchive.user_id == current_user.id, ChatArchive.bot == bot))
+    await db.execute(delete(Summary).where(Summary.user_id == current_user.id, Summary.bot == bot))
+    # Reset rather than delete the counter, so its generation tells other workers' caches
+    await db.execute(update(ChatCounter).where(ChatCounter.user_id == current_user.id, ChatCounter.bot == bot)
+                     .values(message_count=0, generation=ChatCounter.generation + 1))
+    await db.commit()
+    context_cache.invalidate(current_user.id, bot)
+    memory_index.invalidate(current_user.id, bot)
+    forget_blocks(current_user.id, bot)
     
     return JSONResponse({"message": f"Deleted all {bot} conversations"})
 
 @app.post("/api/clear_all")
 async def clear_all_data(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     if not current_user:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
     # Delete all user data
-    db.query(Chat).filter(Chat.user_id == current_user.id).delete()
-    db.query(Summary).filter(Summary.user_id == current_user.id).delete()
-    db.commit()
+    await chat_writer.flush_for(current_user.id)
+    await db.execute(delete(Chat).where(Chat.user_id == current_user.id))
+    await db.execute(delete(ChatArchive).where(ChatArchive.user_id == current_user.id))
+    await db.execute(delete(Summary).where(Summary.user_id == current_user.id))
+    await db.execute(update(ChatCounter).where(ChatCounter.user_id == current_user.id)
+                     .values(message_count=0, generation=ChatCounter.generation + 1))
+    await db.commit()
+    context_cache.invalidate(current_user.id)
+    memory_index.invalidate(current_user.id)
+    forget_blocks(current_user.id)
     
     return JSONResponse({"message": "Deleted all conversation data"})
 
 if __name__ == "__main__":
+    # Single-process development server; serve.py runs the multi-worker production setup
     import uvicorn
     port = int(os.environ.get("PORT", 8000))
     uvicorn.run(app, host="0.0.0.0", port=port)
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Database size and history latency before and after chat compaction.
+
+Seeds a fresh SQLite database with a year of chats and summaries per
+conversation, times history pages (newest page and deep cursor pages),
+runs chat_archive.compact(), VACUUMs and measures again. Verifies that
+paging through the whole history returns the same rows afterwards.
+
+    python benchmarks/chat_compaction.py --users 200 --turns 400
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+TMP_DIR = tempfile.mkdtemp()
+DB_PATH = os.path.join(TMP_DIR, "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ["SUMMARY_PERSIST_JOBS"] = "0"
+
+from sqlalchemy import func, select
+
+import chat_archive
+from app import chat_history_page, history_cursor_key
+from database import AsyncReadSessionLocal, AsyncSessionLocal, Chat, ChatArchive, Summary, dispose_engines
+from migrate_db import upgrade_schema
+
+BOTS = ("aarav", "meera")
+WORDS = ("feel", "anxious", "breathing", "exam", "sleep", "family", "work", "tired", "better", "today",
+         "thoda", "tension", "hai", "yaar", "mann", "nahi", "lag", "raha", "kal", "neend")
+
+
+def sentence(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def sql_time(moment: datetime) -> str:
+    # The format SQLAlchemy stores DateTime in on SQLite, so range filters compare correctly
+    return moment.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def seed(users: int, turns: int, summaries: int):
+    rng = random.Random(7)
+    now = datetime.utcnow()
+    conn = sqlite3.connect(DB_PATH)
+    for user_id in range(1, users + 1):
+        for bot in BOTS:
+            start = now - timedelta(days=365)
+            step = timedelta(days=365) / turns
+            conn.executemany(
+                "INSERT INTO chats (user_id, bot, message, reply, timestamp, via_call) VALUES (?, ?, ?, ?, ?, ?)",
+                [(user_id, bot, sentence(rng, 12), sentence(rng, 60), sql_time(start + i * step), False)
+                 for i in range(turns)]
+            )
+            conn.executemany(
+                "INSERT INTO summaries (user_id, bot, summary_text, created_at) VALUES (?, ?, ?, ?)",
+                [(user_id, bot, sentence(rng, 80), sql_time(start + i * step * 8)) for i in range(summaries)]
+            )
+    conn.commit()
+    conn.close()
+
+
+def db_size() -> int:
+    conn = sqlite3.connect(DB_PATH)
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+    return os.path.getsize(DB_PATH)
+
+
+def vacuum():
+    conn = sqlite3.connect(DB_PATH)
+    conn.execute("VACUUM")
+    conn.close()
+
+
+async def page_all(user_id: int, bot: str, limit: int) -> list:
+    """Every row of a conversation, paged the way a client pages /api/chats"""
+    rows, before_key = [], None
+    async with AsyncReadSessionLocal() as db:
+        while True:
+            page = await chat_history_page(db, user_id, bot, before_key, limit)
+            rows += page
+            if len(page) < limit:
+                return rows
+            before_key = await history_cursor_key(db, user_id, bot, page[-1]["id"])
+
+
+async def time_pages(users: int, turns: int, limit: int, samples: int):
+    """Latency of the newest page and of a page from the oldest third of history"""
+    rng = random.Random(11)
+    newest, deep = [], []
+    async with AsyncReadSessionLocal() as db:
+        for _ in range(samples):
+            user_id, bot = rng.randint(1, users), rng.choice(BOTS)
+            started = time.perf_counter()
+            await chat_history_page(db, user_id, bot, None, limit)
+            newest.append(time.perf_counter() - started)
+
+            rows = await page_all(user_id, bot, 200)
+            cursor_id = rows[rng.randint(len(rows) * 2 // 3, len(rows) - limit - 1)]["id"]
+            started = time.perf_counter()
+            before_key = await history_cursor_key(db, user_id, bot, cursor_id)
+            await chat_history_page(db, user_id, bot, before_key, limit)
+            deep.append(time.perf_counter() - started)
+    return newest, deep
+
+
+def ms(values, q):
+    return statistics.quantiles(values, n=100)[q - 1] * 1000
+
+
+async def counts():
+    async with AsyncSessionLocal() as db:
+        return (await db.scalar(select(func.count(Chat.id))), await db.scalar(select(func.count(ChatArchive.id))),
+                await db.scalar(select(func.count(Summary.id))))
+
+
+async def main_async(args):
+    upgrade_schema()
+    seed(args.users, args.turns, args.summaries)
+    vacuum()
+    sample = [(user_id, bot) for user_id in (1, args.users) for bot in BOTS]
+    before_rows = {key: await page_all(*key, args.limit) for key in sample}
+    reports = {"before": (db_size(), await counts(), await time_pages(args.users, args.turns, args.limit, args.samples))}
+
+    started = time.perf_counter()
+    result = await chat_archive.compact(args.after_days)
+    compact_seconds = time.perf_counter() - started
+    vacuum()
+    reports["after"] = (db_size(), await counts(), await time_pages(args.users, args.turns, args.limit, args.samples))
+
+    print(f"{args.users} users x {len(BOTS)} bots x {args.turns} turns, {args.summaries} summaries each")
+    print(f"compaction: {result['rows_archived']} chats into blocks, {result['summaries_pruned']} summaries pruned "
+          f"in {compact_seconds:.2f}s (codec {'zstd' if chat_archive.zstandard else 'zlib'})")
+    for label, (size, (chats, blocks, summaries), (newest, deep)) in reports.items():
+        print(f"{label:>7}: {size / 1e6:7.1f} MB  chats {chats:7d}  blocks {blocks:5d}  summaries {summaries:6d}  "
+              f"newest page p50 {ms(newest, 50):5.2f} ms p95 {ms(newest, 95):5.2f} ms  "
+              f"deep page p50 {ms(deep, 50):5.2f} ms p95 {ms(deep, 95):5.2f} ms")
+
+    for key, rows in before_rows.items():
+        if await page_all(*key, args.limit) != rows:
+            sys.exit(f"history changed after compaction for {key}")
+    await dispose_engines()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=400, help="turns per conversation, spread over a year")
+    parser.add_argument("--summaries", type=int, default=50, help="summaries per conversation")
+    parser.add_argument("--after-days", type=float, default=chat_archive.ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--limit", type=int, default=50, help="history page size")
+    parser.add_argument("--samples", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
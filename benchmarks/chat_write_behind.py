@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Per-message commits vs the write-behind chat buffer.
+
+Concurrent async writers each save chat rows the way save_chat_and_summarize
+does: one transaction per message (insert + counter bump + commit), or
+chat_writer.ChatWriteBuffer batching them every --interval-ms / --max-rows.
+Write-behind time includes draining the buffer, so both columns measure
+rows that are actually durable.
+
+    python benchmarks/chat_write_behind.py --writers 50 --messages 40
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+TMP_DIR = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TMP_DIR, 'bench.db')}"
+os.environ["SUMMARY_PERSIST_JOBS"] = "0"
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+
+from database import AsyncSessionLocal, Base, Chat, dispose_engines, engine
+from chat_writer import ChatWriteBuffer, increment_chat_counter
+
+
+def make_chat(user_id: int, i: int) -> Chat:
+    return Chat(user_id=user_id, bot="aarav", message=f"message {i}", reply="reply " * 40, via_call=False)
+
+
+async def per_message(writers: int, messages: int):
+    errors = []
+
+    async def writer(user_id):
+        for i in range(messages):
+            async with AsyncSessionLocal() as db:
+                try:
+                    db.add(make_chat(user_id, i))
+                    await increment_chat_counter(db, user_id, "aarav")
+                    await db.commit()
+                except OperationalError as e:
+                    await db.rollback()
+                    errors.append(e)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(writer(user_id) for user_id in range(writers)))
+    return time.perf_counter() - started, writers * messages - len(errors), len(errors)
+
+
+async def write_behind(writers: int, messages: int, interval_ms: float, max_rows: int):
+    buffer = ChatWriteBuffer(enabled=True, interval_ms=interval_ms, max_rows=max_rows)
+    await buffer.start()
+
+    async def writer(user_id):
+        for i in range(messages):
+            buffer.add(make_chat(writers + user_id, i))
+            await asyncio.sleep(0)  # other requests run between saves, as in the app
+
+    started = time.perf_counter()
+    await asyncio.gather(*(writer(user_id) for user_id in range(writers)))
+    await buffer.stop()
+    return time.perf_counter() - started, buffer.metrics()["flushes"]
+
+
+async def main_async(args):
+    elapsed, written, errors = await per_message(args.writers, args.messages)
+    rows = args.writers * args.messages
+    print(f"{args.writers} writers x {args.messages} messages ({rows} rows)")
+    print(f" per-message: {written / elapsed:8.0f} rows/s  ({elapsed:.2f}s, {written} commits, {errors} lock errors)")
+    elapsed, flushes = await write_behind(args.writers, args.messages, args.interval_ms, args.max_rows)
+    print(f"write-behind: {rows / elapsed:8.0f} rows/s  ({elapsed:.2f}s, {flushes} commits)")
+
+    async with AsyncSessionLocal() as db:
+        stored = await db.scalar(select(func.count(Chat.id)).where(Chat.user_id >= args.writers))
+    await dispose_engines()
+    if stored != rows:
+        sys.exit(f"write-behind lost rows: {stored}/{rows} stored")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=50)
+    parser.add_argument("--messages", type=int, default=40)
+    parser.add_argument("--interval-ms", type=float, default=50)
+    parser.add_argument("--max-rows", type=int, default=200)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Recall, precision and speed of the local crisis screener.
+
+Checks screen_message against the labelled fixture set (English, Hinglish,
+Devanagari, including everyday idioms like "this exam is killing me" that
+must not trigger), then times it per message. Exits non-zero if any
+labelled crisis message is missed.
+
+    python benchmarks/crisis_screening.py --repeat 5000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from crisis_screener import crisis_reply, screen_message
+
+FIXTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "crisis_messages.jsonl")
+
+
+def load_fixture():
+    with open(FIXTURE_PATH, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def time_per_message(fn, messages, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for message in messages:
+            fn(message)
+    return (time.perf_counter() - start) / (repeat * len(messages)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5000)
+    args = parser.parse_args()
+
+    cases = load_fixture()
+    messages = [case["message"] for case in cases]
+
+    misses = [case for case in cases if case["crisis"] and not screen_message(case["message"])]
+    false_alarms = [case for case in cases if not case["crisis"] and screen_message(case["message"])]
+    positives = sum(case["crisis"] for case in cases)
+    flagged = positives - len(misses) + len(false_alarms)
+    print(f"   recall: {(positives - len(misses)) / positives:.1%} ({positives - len(misses)}/{positives})")
+    print(f"precision: {(positives - len(misses)) / flagged:.1%} ({positives - len(misses)}/{flagged})" if flagged else "precision: n/a")
+    for case in misses:
+        print(f"     miss: {case['message']!r}")
+    for case in false_alarms:
+        print(f"    false: {case['message']!r} -> {screen_message(case['message'])!r}")
+
+    screen = time_per_message(screen_message, messages, args.repeat)
+    reply = time_per_message(crisis_reply, messages, max(1, args.repeat // 10))
+    print(f"   screen: {screen:6.2f} us/message")
+    print(f"    reply: {reply:6.2f} us/message (language detection + template)")
+
+    sys.exit(1 if misses else 0)
+
+
+if __name__ == "__main__":
+    main()
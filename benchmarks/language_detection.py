@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Accuracy and speed of the language-style detector.
+
+Checks detect_language_style against the labelled fixture set, then times
+it (and the batch API) against the previous substring-scan implementation.
+
+    python benchmarks/language_detection.py --repeat 2000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from language_detector import (
+    HINGLISH_WORDS, HINDI_ROMAN_WORDS, detect_language_style, detect_language_batch
+)
+
+FIXTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "language_styles.jsonl")
+
+
+def legacy_detect_language_style(message: str) -> str:
+    """The original substring-based detector, kept here as the baseline"""
+    message_lower = message.lower()
+    hindi_chars = any('\u0900' <= char <= '\u097F' for char in message)
+    hinglish_count = sum(1 for word in HINGLISH_WORDS if word in message_lower)
+    hindi_roman_count = sum(1 for word in HINDI_ROMAN_WORDS if word in message_lower)
+    if hindi_chars:
+        return "hindi_devanagari"
+    elif hinglish_count >= 2 or hindi_roman_count >= 1:
+        return "hinglish"
+    elif any(word in message_lower for word in ['the', 'and', 'is', 'are', 'was', 'were', 'have', 'has', 'will', 'would', 'should', 'could']):
+        return "english"
+    else:
+        return "mixed"
+
+
+def load_fixture():
+    with open(FIXTURE_PATH, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def accuracy(detector, cases):
+    misses = [case for case in cases if detector(case["message"]) != case["style"]]
+    return 1 - len(misses) / len(cases), misses
+
+
+def time_per_message(fn, messages, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(messages)
+    return (time.perf_counter() - start) / (repeat * len(messages)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    cases = load_fixture()
+    messages = [case["message"] for case in cases]
+
+    for name, detector in (("legacy", legacy_detect_language_style), ("current", detect_language_style)):
+        score, misses = accuracy(detector, cases)
+        print(f"{name:>8} accuracy: {score:.1%} ({len(cases) - len(misses)}/{len(cases)})")
+        for case in misses:
+            print(f"          miss: {case['message']!r} -> {detector(case['message'])} (want {case['style']})")
+
+    legacy = time_per_message(lambda ms: [legacy_detect_language_style(m) for m in ms], messages, args.repeat)
+    current = time_per_message(lambda ms: [detect_language_style(m) for m in ms], messages, args.repeat)
+    batch = time_per_message(detect_language_batch, messages, args.repeat)
+    print(f"  legacy: {legacy:6.2f} us/message")
+    print(f" current: {current:6.2f} us/message ({legacy / current:.1f}x)")
+    print(f"   batch: {batch:6.2f} us/message (with scores)")
+
+    current_score, _ = accuracy(detect_language_style, cases)
+    sys.exit(0 if current_score == 1.0 else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test against a local app and the stub LLM server.
+
+By default this starts benchmarks/stub_llm_server.py and the app (uvicorn,
+fresh SQLite database in a temp dir), then runs a population of scripted
+users. Each user signs up, completes /assessment, chats with aarav and
+meera (8 messages per bot by default, so every user hits the summary path),
+and pages back through both histories. It reports throughput, p50/p95/p99
+per endpoint and database growth, all offline on one box.
+
+    python benchmarks/load_test.py --users 50 --ramp 5 --messages 8
+    python benchmarks/load_test.py --llm-first-byte 1.5 --llm-error-rate 0.05 --json load.json
+
+Point it at an already running app instead (summary drain and DB growth
+need /metrics and the database path respectively):
+
+    python benchmarks/load_test.py --app-url http://127.0.0.1:8000 --db-path sukoon.db
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+import httpx
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+BOTS = ("aarav", "meera")
+MESSAGES = (
+    "I have been feeling really anxious about my exams",
+    "yaar kal se neend nahi aa rahi, bahut tension hai",
+    "My parents keep comparing me with my cousin",
+    "aaj office mein bahut bura din tha",
+    "How do I stop overthinking at night?",
+    "mujhe samajh nahi aa raha kya karun",
+    "I feel lonely even when I'm with friends",
+    "Thanks, that breathing tip actually helped a bit",
+)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+
+
+@contextmanager
+def local_services(args):
+    """Run the stub LLM and the app as subprocesses; yields (app_url, db_path, stub_url)"""
+    with tempfile.TemporaryDirectory() as tmp:
+        stub_port, app_port = free_port(), free_port()
+        db_path = os.path.join(tmp, "load.db")
+        stub = subprocess.Popen([
+            sys.executable, os.path.join(ROOT, "benchmarks", "stub_llm_server.py"),
+            "--port", str(stub_port),
+            "--first-byte", str(args.llm_first_byte),
+            "--tokens-per-second", str(args.llm_tokens_per_second),
+            "--reply-tokens", str(args.llm_reply_tokens),
+            "--error-rate", str(args.llm_error_rate)
+        ])
+        env = dict(
+            os.environ,
+            DATABASE_URL=f"sqlite:///{db_path}",
+            LLM_BASE_URL=f"http://127.0.0.1:{stub_port}/api/v1/chat/completions",
+            LLM_MODELS="stub-model",
+            OPENROUTER_API_KEY="stub"
+        )
+        if args.bcrypt_rounds:
+            env["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+        app = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app:app", "--port", str(app_port), "--log-level", "warning"],
+            cwd=ROOT, env=env
+        )
+        try:
+            wait_until_up(f"http://127.0.0.1:{stub_port}/stats")
+            wait_until_up(f"http://127.0.0.1:{app_port}/login")
+            yield f"http://127.0.0.1:{app_port}", db_path, f"http://127.0.0.1:{stub_port}"
+        finally:
+            for process in (app, stub):
+                process.terminate()
+            for process in (app, stub):
+                process.wait(timeout=30)
+
+
+def db_size(db_path: str) -> int:
+    """Main file plus WAL; the WAL holds recent writes until a checkpoint"""
+    return sum(os.path.getsize(db_path + suffix) for suffix in ("", "-wal") if os.path.exists(db_path + suffix))
+
+
+def db_row_counts(db_path: str) -> dict:
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        return {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in ("users", "chats", "summaries")}
+    finally:
+        conn.close()
+
+
+def percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Recorder:
+    """Latency samples, failures and 503 sheds per logical endpoint"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = Counter()
+        self.shed = Counter()
+
+    def add(self, name: str, seconds: float, ok: bool = True):
+        self.samples[name].append(seconds)
+        if not ok:
+            self.errors[name] += 1
+
+    def summary(self):
+        rows = {}
+        for name in sorted(set(self.samples) | set(self.errors) | set(self.shed)):
+            values = sorted(self.samples[name])
+            rows[name] = {
+                "count": len(values),
+                "errors": self.errors[name],
+                "shed": self.shed[name],
+                "p50": percentile(values, 50),
+                "p95": percentile(values, 95),
+                "p99": percentile(values, 99),
+                "max": values[-1] if values else 0.0
+            }
+        return rows
+
+
+class VirtualUser:
+    def __init__(self, index: int, args, recorder: Recorder, run_id: str):
+        self.args = args
+        self.recorder = recorder
+        self.email = f"load-{run_id}-{index}@example.com"
+        self.client = httpx.AsyncClient(base_url=args.app_url, timeout=args.timeout, follow_redirects=False)
+
+    async def request(self, name: str, method: str, url: str, **kwargs):
+        """Send one request, honouring Retry-After on 503 so backpressure shows as 'shed'"""
+        for _ in range(self.args.max_retries + 1):
+            started = time.perf_counter()
+            try:
+                response = await self.client.request(method, url, **kwargs)
+            except httpx.HTTPError:
+                self.recorder.add(name, time.perf_counter() - started, ok=False)
+                return None
+            elapsed = time.perf_counter() - started
+            if response.status_code == 503:
+                self.recorder.shed[name] += 1
+                await asyncio.sleep(float(response.headers.get("retry-after", 1)))
+                continue
+            self.recorder.add(name, elapsed, ok=response.status_code < 400)
+            return response
+        self.recorder.errors[name] += 1
+        return None
+
+    async def stream_chat(self, bot: str, message: str):
+        """Time to first delta and to the done event for one streamed reply"""
+        started = time.perf_counter()
+        first_delta = None
+        ok = False
+        try:
+            async with self.client.stream("POST", f"/chat/{bot}", json={"message": message, "stream": True}) as response:
+                if response.status_code == 503:
+                    self.recorder.shed["chat_stream"] += 1
+                    return
+                async for line in response.aiter_lines():
+                    if line.startswith("event: error"):
+                        break
+                    if line.startswith("data:"):
+                        if first_delta is None:
+                            first_delta = time.perf_counter() - started
+                        if '"done": true' in line:
+                            ok = True
+        except httpx.HTTPError:
+            pass
+        if first_delta is not None:
+            self.recorder.add("chat_stream_first_delta", first_delta)
+        self.recorder.add("chat_stream", time.perf_counter() - started, ok=ok)
+
+    async def run(self):
+        try:
+            response = await self.request("signup", "POST", "/signup", data={
+                "full_name": "Load Test", "email": self.email, "password": "load-test-pw",
+                "age": random.randint(16, 30), "gender": "prefer_not_to_say"
+            })
+            token = response.cookies.get("access_token") if response is not None else None
+            if not token:
+                return
+            self.client.cookies.set("access_token", token)
+
+            await self.request("assessment", "POST", "/assessment", data={
+                "mood": "low", "anxiety": "several_days", "sleep": "several_days",
+                "interest": "not_at_all", "support": "some", "self_harm": "not_at_all"
+            })
+
+            for bot in BOTS:
+                for i in range(self.args.messages):
+                    message = MESSAGES[i % len(MESSAGES)]
+                    if random.random() < self.args.stream_ratio:
+                        await self.stream_chat(bot, message)
+                    else:
+                        await self.request("chat", "POST", f"/chat/{bot}", json={"message": message})
+                    await asyncio.sleep(random.uniform(0, self.args.think_time))
+
+            for bot in BOTS:
+                cursor = None
+                while True:
+                    params = {"limit": self.args.page_size}
+                    if cursor is not None:
+                        params["before"] = cursor
+                    response = await self.request("history_page", "GET", f"/api/chats/{bot}", params=params)
+                    if response is None or response.status_code != 200:
+                        break
+                    cursor = response.json()["next_cursor"]
+                    if cursor is None:
+                        break
+        finally:
+            await self.client.aclose()
+
+
+async def wait_for_summaries(app_url: str, timeout: float) -> float:
+    """Poll /metrics until the summary queue drains; returns seconds waited"""
+    started = time.perf_counter()
+    async with httpx.AsyncClient(base_url=app_url, timeout=5) as client:
+        while time.perf_counter() - started < timeout:
+            response = await client.get("/metrics")
+            depth = next((float(line.split()[-1]) for line in response.text.splitlines() if line.startswith("sukoon_summary_queue_depth ")), 0)
+            if not depth:
+                break
+            await asyncio.sleep(0.5)
+    return time.perf_counter() - started
+
+
+async def run_population(args):
+    recorder = Recorder()
+    run_id = uuid.uuid4().hex[:8]
+
+    async def start_user(index):
+        await asyncio.sleep(args.ramp * index / max(1, args.users))
+        await VirtualUser(index, args, recorder, run_id).run()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(start_user(i) for i in range(args.users)))
+    elapsed = time.perf_counter() - started
+    drained = await wait_for_summaries(args.app_url, args.drain_timeout)
+    return recorder, elapsed, drained
+
+
+def print_report(report: dict):
+    print(f"{report['users']} users x {report['messages_per_bot']} messages per bot, "
+          f"{report['elapsed_seconds']:.1f}s wall, {report['throughput_rps']:.1f} req/s, "
+          f"{report['chat_messages_per_second']:.1f} chat msg/s")
+    print(f"{'endpoint':<24}{'count':>7}{'errors':>8}{'shed':>6}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for name, row in report["endpoints"].items():
+        print(f"{name:<24}{row['count']:>7}{row['errors']:>8}{row['shed']:>6}"
+              f"{row['p50'] * 1000:>9.1f}{row['p95'] * 1000:>9.1f}{row['p99'] * 1000:>9.1f}{row['max'] * 1000:>9.1f}")
+    print(f"summary queue drained in {report['summary_drain_seconds']:.1f}s")
+    if "llm_upstream" in report:
+        print(f"stub LLM: {report['llm_upstream']}")
+    growth = report.get("db")
+    if growth:
+        print(f"database: {growth['bytes_before'] / 1024:.0f} KiB -> {growth['bytes_after'] / 1024:.0f} KiB "
+              f"({growth['bytes_per_chat']:.0f} bytes/chat), rows {growth['rows']}")
+
+
+def build_report(args, recorder: Recorder, elapsed: float, drained: float, db_path: str, size_before: int):
+    endpoints = recorder.summary()
+    total = sum(row["count"] for name, row in endpoints.items() if name != "chat_stream_first_delta")
+    chats = endpoints.get("chat", {}).get("count", 0) + endpoints.get("chat_stream", {}).get("count", 0)
+    report = {
+        "users": args.users,
+        "messages_per_bot": args.messages,
+        "elapsed_seconds": elapsed,
+        "throughput_rps": total / elapsed if elapsed else 0.0,
+        "chat_messages_per_second": chats / elapsed if elapsed else 0.0,
+        "summary_drain_seconds": drained,
+        "endpoints": endpoints
+    }
+    if db_path and os.path.exists(db_path):
+        rows = db_row_counts(db_path)
+        size_after = db_size(db_path)
+        report["db"] = {
+            "bytes_before": size_before,
+            "bytes_after": size_after,
+            "bytes_per_chat": (size_after - size_before) / rows["chats"] if rows["chats"] else 0.0,
+            "rows": rows
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--ramp", type=float, default=2.0, help="seconds over which users start")
+    parser.add_argument("--messages", type=int, default=8, help="messages per user per bot; 8 triggers a summary")
+    parser.add_argument("--stream-ratio", type=float, default=0.5, help="fraction of chats sent with stream: true")
+    parser.add_argument("--think-time", type=float, default=0.2, help="max random pause between messages")
+    parser.add_argument("--page-size", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--max-retries", type=int, default=3, help="retries after a 503")
+    parser.add_argument("--drain-timeout", type=float, default=60)
+    parser.add_argument("--app-url", help="use an already running app instead of starting one")
+    parser.add_argument("--db-path", help="SQLite file of --app-url, for growth stats")
+    parser.add_argument("--bcrypt-rounds", type=int, help="BCRYPT_ROUNDS for the launched app")
+    parser.add_argument("--llm-first-byte", type=float, default=0.3)
+    parser.add_argument("--llm-tokens-per-second", type=float, default=200)
+    parser.add_argument("--llm-reply-tokens", type=int, default=60)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--json", help="also write the report as JSON to this path")
+    args = parser.parse_args()
+
+    def run(db_path, stub_url=None):
+        size_before = db_size(db_path) if db_path and os.path.exists(db_path) else 0
+        recorder, elapsed, drained = asyncio.run(run_population(args))
+        report = build_report(args, recorder, elapsed, drained, db_path, size_before)
+        if stub_url:
+            # Upstream calls include summaries, retries and hedges, not just chats
+            report["llm_upstream"] = httpx.get(f"{stub_url}/stats").json()
+        return report
+
+    if args.app_url:
+        report = run(args.db_path)
+    else:
+        with local_services(args) as (app_url, db_path, stub_url):
+            args.app_url = app_url
+            report = run(db_path, stub_url)
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
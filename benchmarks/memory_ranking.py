@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Relevance and speed of the summary memory index.
+
+Builds one conversation's memory from topic-labelled summaries (English and
+Hinglish), then for each probe message checks whether a summary on the
+probe's topic makes it into the prompt: memory_index ranking vs the old
+"latest MAX_SUMMARIES" rule. Times ranking per message with NumPy and with
+the pure-Python fallback.
+
+    python benchmarks/memory_ranking.py --summaries 32 --repeat 2000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import memory_index
+from llm_client import MAX_SUMMARIES, estimate_tokens
+from memory_index import ConversationMemory, MemoryItem, decode_embedding, encode_embedding
+
+TOPICS = {
+    "exams": ("The user is anxious about upcoming board exams and feels they are falling behind on revision. "
+              "They mentioned pressure from parents about marks and trouble concentrating while studying.",
+              "User ko exam ki bahut tension hai, padhai mein mann nahi lagta aur results ka darr hai."),
+    "sleep": ("The user has been sleeping badly, waking up at 3am with racing thoughts. "
+              "We discussed a wind-down routine, less screen time at night and a breathing exercise before bed.",
+              "User ko neend nahi aati, raat bhar sochta rehta hai; humne sone se pehle breathing try karne ko kaha."),
+    "family": ("The user argued with their father again about career choices. They feel unheard at home "
+               "and guilty for disappointing their family.",
+               "Ghar pe papa se phir ladai hui, user ko lagta hai family unki baat nahi samajhti."),
+    "breakup": ("The user is coping with a recent breakup and keeps checking their ex's social media. "
+                "They feel lonely in the evenings and miss the relationship.",
+                "Breakup ke baad user bahut akela feel karta hai, ex ki yaad aati rehti hai."),
+    "work": ("The user feels burnt out at their job, with long hours and a critical manager. "
+             "They are considering asking for time off but worry about their appraisal.",
+             "Office mein kaam ka bahut pressure hai, manager har baat pe daantta hai, user thak gaya hai."),
+}
+
+PROBES = {
+    "exams": ["my exam is next week and I can't focus", "kal exam hai aur kuch yaad nahi ho raha", "worried about my marks"],
+    "sleep": ["I couldn't sleep again last night", "neend nahi aa rahi yaar", "can you remind me of that breathing exercise before bed"],
+    "family": ["dad shouted at me about my career again", "papa se phir ladai ho gayi", "nobody at home listens to me"],
+    "breakup": ["I saw my ex's new post today", "breakup ke baad bahut akela lag raha hai", "I miss her so much"],
+    "work": ["my manager criticised me in front of everyone", "office mein bahut pressure hai", "should I ask for leave from work"],
+}
+
+
+def build(summaries: int, seed: int):
+    rng = random.Random(seed)
+    topics = [rng.choice(list(TOPICS)) for _ in range(summaries)]
+    texts = [rng.choice(TOPICS[topic]) for topic in topics]
+    # Newest first, as the index stores them
+    items = [MemoryItem(i, text) for i, text in enumerate(texts)]
+    vectors = [decode_embedding(encode_embedding(text)) for text in texts]
+    return topics, items, vectors
+
+
+def evaluate(topics, items, vectors):
+    memory = ConversationMemory(items, vectors, generation=0)
+    hits = {"memory index": 0, "latest summaries": 0}
+    tokens = {"memory index": [], "latest summaries": []}
+    probes = [(topic, probe) for topic, messages in PROBES.items() for probe in messages if topic in topics]
+    for topic, probe in probes:
+        chosen = memory.select(probe, MAX_SUMMARIES)
+        for label, picked in (("memory index", chosen), ("latest summaries", list(range(MAX_SUMMARIES)))):
+            hits[label] += any(topics[i] == topic for i in picked)
+            tokens[label].append(sum(estimate_tokens(items[i].summary_text) for i in picked))
+    return len(probes), hits, tokens
+
+
+def time_ranking(items, vectors, repeat):
+    memory = ConversationMemory(items, vectors, generation=0)
+    probes = [probe for messages in PROBES.values() for probe in messages]
+    samples = []
+    for i in range(repeat):
+        probe = probes[i % len(probes)]
+        started = time.perf_counter()
+        memory.select(probe, MAX_SUMMARIES)
+        samples.append(time.perf_counter() - started)
+    quantiles = statistics.quantiles(samples, n=100)
+    return quantiles[49] * 1e6, quantiles[98] * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--summaries", type=int, default=memory_index.MEMORY_MAX_SUMMARIES)
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    topics, items, vectors = build(args.summaries, args.seed)
+    probes, hits, tokens = evaluate(topics, items, vectors)
+    print(f"{args.summaries} summaries, {probes} probe messages, k={MAX_SUMMARIES}")
+    for label in hits:
+        print(f"{label:>17}: on-topic summary in prompt {hits[label] / probes:6.1%}, "
+              f"summary tokens avg {statistics.mean(tokens[label]):5.0f}")
+
+    numpy_module = memory_index.np
+    if numpy_module is not None:
+        p50, p99 = time_ranking(items, vectors, args.repeat)
+        print(f"     rank (numpy): p50 {p50:6.1f} us  p99 {p99:6.1f} us")
+    memory_index.np = None
+    p50, p99 = time_ranking(items, vectors, args.repeat)
+    print(f"    rank (python): p50 {p50:6.1f} us  p99 {p99:6.1f} us")
+    memory_index.np = numpy_module
+
+
+if __name__ == "__main__":
+    main()
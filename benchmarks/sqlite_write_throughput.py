@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Compare chat-insert throughput for the stock SQLite settings vs the tuned
+"production" profile (WAL, synchronous=NORMAL, busy_timeout, mmap, cache).
+
+Each writer thread inserts chat rows with one commit per message, which is
+what the chat endpoint does.
+
+    python benchmarks/sqlite_write_throughput.py --writers 8 --messages 200
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, Chat, make_engine
+
+
+def run(profile: str, writers: int, messages: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}", profile=profile)
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine)
+        errors = []
+
+        def writer(user_id):
+            db = Session()
+            try:
+                for i in range(messages):
+                    db.add(Chat(user_id=user_id, bot="aarav", message=f"message {i}", reply="reply " * 40))
+                    try:
+                        db.commit()
+                    except OperationalError as e:
+                        db.rollback()
+                        errors.append(e)
+            finally:
+                db.close()
+
+        threads = [threading.Thread(target=writer, args=(n,)) for n in range(writers)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        engine.dispose()
+
+    written = writers * messages - len(errors)
+    return written / elapsed, elapsed, len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--messages", type=int, default=200, help="messages per writer")
+    args = parser.parse_args()
+
+    print(f"{args.writers} writers x {args.messages} messages, one commit per message")
+    for profile in ("default", "production"):
+        rate, elapsed, errors = run(profile, args.writers, args.messages)
+        print(f"{profile:>10}: {rate:8.0f} writes/s  ({elapsed:.2f}s, {errors} lock errors)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Cold-start cost: app import time and serve.py time-to-ready.
+
+Imports the app in fresh interpreters and reports the median import time
+plus the modules that dominate it, from `python -X importtime`.
+Then starts serve.py on a fresh SQLite database and times how long until
+/readyz answers 200 on every worker.
+
+    python benchmarks/startup_time.py --runs 5 --workers 2
+    python benchmarks/startup_time.py --budget-ms 1500   # exit 1 if the median import is slower
+
+Run it in CI or before shipping a new dependency so autoscaled containers keep starting fast.
+"""
+
+import argparse
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+_IMPORTTIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def import_profile(env: dict) -> list:
+    """[(cumulative_us, self_us, depth, module)] for one fresh `import app`"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"],
+                            cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            rows.append((int(cumulative_us), int(self_us), len(indent) // 2, module))
+    return rows
+
+
+def import_times(runs: int, env: dict):
+    totals, profiles = [], []
+    for _ in range(runs):
+        rows = import_profile(env)
+        totals.append(next(cumulative for cumulative, _, _, module in rows if module == "app") / 1000)
+        profiles.append(rows)
+    return totals, profiles[len(profiles) // 2]
+
+
+def time_to_ready(workers: int, env: dict, timeout: float = 60) -> float:
+    """Seconds from launching serve.py until all workers answer /readyz"""
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", str(workers), "--port", str(port), "--host", "127.0.0.1", "--drain", "0"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        ready = set()
+        deadline = time.monotonic() + timeout
+        with httpx.Client(timeout=1) as client:
+            while len(ready) < workers:
+                if time.monotonic() > deadline or server.poll() is not None:
+                    raise RuntimeError(f"serve.py did not become ready within {timeout:.0f}s")
+                try:
+                    # New connection per probe so the kernel spreads them over the workers
+                    response = client.get(f"http://127.0.0.1:{port}/readyz", headers={"Connection": "close"})
+                    if response.status_code == 200:
+                        ready.add(response.json()["pid"])
+                        continue
+                except httpx.HTTPError:
+                    pass
+                time.sleep(0.02)
+        return time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=12, help="heaviest imports to list")
+    parser.add_argument("--workers", type=int, default=2, help="serve.py workers for time-to-ready; 0 skips it")
+    parser.add_argument("--budget-ms", type=float, help="fail if the median import takes longer")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'startup.db')}",
+            STATIC_BUILD_DIR=os.path.join(tmp, "static_build"),
+            OPENROUTER_API_KEY=os.environ.get("OPENROUTER_API_KEY", "stub")
+        )
+        # Warm the .pyc cache once so runs measure imports, not compilation
+        import_profile(env)
+        totals, profile = import_times(args.runs, env)
+        print(f"import app: median {statistics.median(totals):7.1f} ms  min {min(totals):7.1f} ms  ({args.runs} runs)")
+
+        print("heaviest direct imports of app (cumulative ms):")
+        direct = sorted((row for row in profile if row[2] == 1), reverse=True)
+        for cumulative, _, _, module in direct[:args.top]:
+            print(f"  {cumulative / 1000:7.1f}  {module}")
+
+        if args.workers:
+            print(f"serve.py time to ready ({args.workers} workers): {time_to_ready(args.workers, env):.2f} s")
+
+    if args.budget_ms is not None and statistics.median(totals) > args.budget_ms:
+        print(f"median import exceeds the {args.budget_ms:.0f} ms budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the OpenRouter chat-completions API.
+
+Serves POST /api/v1/chat/completions (buffered and "stream": true) with a
+configurable time to first byte, token rate and error injection, globally
+or per model, so routing, retries, hedging and load tests run offline.
+
+    python benchmarks/stub_llm_server.py --port 9100 --first-byte 0.3 \\
+        --model-latency slow-model=5 --model-error-rate flaky-model=0.5
+
+Point the app at it with:
+
+    LLM_BASE_URL=http://127.0.0.1:9100/api/v1/chat/completions \\
+    OPENROUTER_API_KEY=stub LLM_MODELS=slow-model,fast-model
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+REPLY_WORDS = (
+    "That sounds really hard, and it makes sense that you feel this way. "
+    "Try a slow breathing exercise: in for four counts, hold for four, out for six. "
+    "Then write down one small thing you can do today. What usually helps you feel calmer?"
+).split()
+
+
+def parse_overrides(pairs):
+    overrides = {}
+    for pair in pairs or []:
+        model, value = pair.rsplit("=", 1)
+        overrides[model] = float(value)
+    return overrides
+
+
+def create_app(args):
+    app = FastAPI(title="Stub LLM")
+    model_latency = parse_overrides(args.model_latency)
+    model_error_rate = parse_overrides(args.model_error_rate)
+    stats = {"requests": 0, "errors": 0, "streams": 0}
+
+    def completion_id():
+        return f"stub-{time.time_ns()}"
+
+    @app.post("/api/v1/chat/completions")
+    async def completions(request: Request):
+        payload = await request.json()
+        model = payload.get("model", "stub")
+        stats["requests"] += 1
+
+        if random.random() < model_error_rate.get(model, args.error_rate):
+            stats["errors"] += 1
+            headers = {"Retry-After": "1"} if args.error_status == 429 else {}
+            return JSONResponse({"error": {"message": "injected failure"}}, status_code=args.error_status, headers=headers)
+
+        await asyncio.sleep(model_latency.get(model, args.first_byte))
+        max_tokens = min(payload.get("max_tokens", 512), args.reply_tokens)
+        words = [REPLY_WORDS[i % len(REPLY_WORDS)] for i in range(max_tokens)]
+        token_delay = 1 / args.tokens_per_second if args.tokens_per_second > 0 else 0
+
+        if not payload.get("stream"):
+            await asyncio.sleep(token_delay * len(words))
+            return JSONResponse({
+                "id": completion_id(),
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": " ".join(words)}}],
+                "usage": {"completion_tokens": len(words)}
+            })
+
+        stats["streams"] += 1
+
+        async def events():
+            cid = completion_id()
+            yield ": OPENROUTER PROCESSING\n\n"
+            for i, word in enumerate(words):
+                delta = word if i == 0 else " " + word
+                yield "data: " + json.dumps({"id": cid, "model": model, "choices": [{"index": 0, "delta": {"content": delta}}]}) + "\n\n"
+                if token_delay:
+                    await asyncio.sleep(token_delay)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    return app
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--first-byte", type=float, default=0.2, help="seconds before the first byte")
+    parser.add_argument("--tokens-per-second", type=float, default=200, help="0 sends the reply at once")
+    parser.add_argument("--reply-tokens", type=int, default=60, help="reply length in words")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--model-latency", action="append", metavar="MODEL=SECONDS")
+    parser.add_argument("--model-error-rate", action="append", metavar="MODEL=RATE")
+    return parser
+
+
+def main():
+    import uvicorn
+    args = build_parser().parse_args()
+    uvicorn.run(create_app(args), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+import asyncio
+import json
+import os
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, select, tuple_
+
+from database import AsyncSessionLocal, Chat, ChatArchive, Summary, dispose_engines
+from llm_client import MAX_HISTORY_TURNS
+from memory_index import MEMORY_MAX_SUMMARIES
+
+try:
+    import zstandard
+except ImportError:  # zlib is always available; zstd compresses better and faster when installed
+    zstandard = None
+
+# Compaction settings (overridable via environment)
+# Opt-in: archived turns leave the chats_fts search index, so compaction trades search over old chats for space
+CHAT_ARCHIVE = os.environ.get("CHAT_ARCHIVE", "0") == "1"
+ARCHIVE_AFTER_DAYS = float(os.environ.get("ARCHIVE_AFTER_DAYS", 90))
+ARCHIVE_BLOCK_ROWS = int(os.environ.get("ARCHIVE_BLOCK_ROWS", 500))
+ARCHIVE_MIN_BLOCK_ROWS = int(os.environ.get("ARCHIVE_MIN_BLOCK_ROWS", 50))
+ARCHIVE_INTERVAL_SECONDS = float(os.environ.get("ARCHIVE_INTERVAL_SECONDS", 6 * 3600))
+# The memory index ranks up to MEMORY_MAX_SUMMARIES per conversation; older ones are never read
+SUMMARY_RETENTION = int(os.environ.get("SUMMARY_RETENTION", MEMORY_MAX_SUMMARIES))
+ARCHIVE_DECODED_BLOCKS = int(os.environ.get("ARCHIVE_DECODED_BLOCKS", 64))
+
+# The newest turns stay live: prompts, summaries and the context cache read them by row
+ARCHIVE_KEEP_RECENT = MAX_HISTORY_TURNS
+
+
+def encode_block(chats) -> tuple:
+    """Compress chats (oldest first) into (codec, bytes)"""
+    payload = json.dumps(
+        [[chat.id, chat.timestamp.isoformat(), chat.message, chat.reply, chat.via_call] for chat in chats],
+        ensure_ascii=False, separators=(",", ":")
+    ).encode()
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=10).compress(payload)
+    return "zlib", zlib.compress(payload, 9)
+
+
+# Blocks never change once written, so decoded ones are reused across pages (a cursor lookup
+# and the page after it decode the same block). Blocks are always fetched from the database
+# first, and entries are keyed by the block's owner and chat range as well as its id, so a
+# cached block is never served for a different conversation.
+_decoded = OrderedDict()
+
+
+def _cache_key(block: ChatArchive) -> tuple:
+    return block.id, block.user_id, block.bot, block.first_chat_id, block.last_chat_id
+
+
+def decode_block(block: ChatArchive) -> list:
+    """Serialized chats of a block, oldest first, in the /api/chats format"""
+    key = _cache_key(block)
+    rows = _decoded.get(key)
+    if rows is None:
+        rows = _decode(block)
+        _decoded[key] = rows
+        if len(_decoded) > ARCHIVE_DECODED_BLOCKS:
+            _decoded.popitem(last=False)
+    else:
+        _decoded.move_to_end(key)
+    return rows
+
+
+def forget_blocks(user_id: int, bot: str = None):
+    """Drop cached decoded blocks of a user's deleted conversations"""
+    for key in [key for key in _decoded if key[1] == user_id and (bot is None or key[2] == bot)]:
+        del _decoded[key]
+
+
+def _decode(block: ChatArchive) -> list:
+    if block.codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError(f"Archive block {block.id} is zstd-compressed but zstandard is not installed")
+        payload = zstandard.ZstdDecompressor().decompress(block.data)
+    else:
+        payload = zlib.decompress(block.data)
+    return [
+        {"id": chat_id, "message": message, "reply": reply, "timestamp": timestamp, "via_call": via_call}
+        for chat_id, timestamp, message, reply, via_call in json.loads(payload)
+    ]
+
+
+def row_key(row: dict) -> tuple:
+    return datetime.fromisoformat(row["timestamp"]), row["id"]
+
+
+async def iter_archived(db, user_id: int, bot: str, before_key: tuple = None):
+    """Archived chats newest first, strictly older than before_key ((timestamp, id)) if given.
+
+    Blocks hold a contiguous, oldest-first run of the conversation and are all
+    older than its live rows, so history pages continue straight into them.
+    One block is fetched and decoded at a time.
+    """
+    key = before_key
+    while True:
+        query = select(ChatArchive).where(ChatArchive.user_id == user_id, ChatArchive.bot == bot)
+        if key is not None:
+            query = query.where(tuple_(ChatArchive.first_timestamp, ChatArchive.first_chat_id) < key)
+        block = await db.scalar(query.order_by(ChatArchive.last_timestamp.desc(), ChatArchive.last_chat_id.desc()).limit(1))
+        if block is None:
+            return
+        for row in reversed(decode_block(block)):
+            if key is None or row_key(row) < key:
+                yield row
+        key = (block.first_timestamp, block.first_chat_id)
+
+
+async def archived_history(db, user_id: int, bot: str, before_key: tuple, limit: int) -> list:
+    rows = []
+    async for row in iter_archived(db, user_id, bot, before_key):
+        rows.append(row)
+        if len(rows) == limit:
+            break
+    return rows
+
+
+async def archived_cursor_key(db, user_id: int, bot: str, chat_id: int):
+    """(timestamp, id) of an archived chat, for cursors that point past the live rows"""
+    blocks = await db.scalars(select(ChatArchive).where(
+        ChatArchive.user_id == user_id, ChatArchive.bot == bot,
+        ChatArchive.first_chat_id <= chat_id, ChatArchive.last_chat_id >= chat_id
+    ))
+    for block in blocks:
+        for row in decode_block(block):
+            if row["id"] == chat_id:
+                return row_key(row)
+    return None
+
+
+async def archive_conversation(user_id: int, bot: str, cutoff: datetime, block_rows: int = ARCHIVE_BLOCK_ROWS,
+                               min_rows: int = ARCHIVE_MIN_BLOCK_ROWS) -> int:
+    """Move this conversation's turns older than cutoff into blocks; returns rows archived"""
+    archived = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            conversation = (Chat.user_id == user_id, Chat.bot == bot)
+            boundary = (await db.execute(
+                select(Chat.timestamp, Chat.id).where(*conversation)
+                .order_by(Chat.timestamp.desc(), Chat.id.desc()).offset(ARCHIVE_KEEP_RECENT - 1).limit(1)
+            )).first()
+            if boundary is None:
+                return archived
+            chats = (await db.scalars(
+                select(Chat).where(*conversation, Chat.timestamp < cutoff, tuple_(Chat.timestamp, Chat.id) < tuple(boundary))
+                .order_by(Chat.timestamp, Chat.id).limit(block_rows)
+            )).all()
+            if len(chats) < min_rows:
+                return archived
+
+            # Delete first: if a concurrent delete_chats or another worker got some rows, give up the block
+            ids = [chat.id for chat in chats]
+            result = await db.execute(delete(Chat).where(Chat.id.in_(ids)).execution_options(synchronize_session=False))
+            if result.rowcount != len(ids):
+                await db.rollback()
+                return archived
+            codec, data = encode_block(chats)
+            db.add(ChatArchive(
+                user_id=user_id, bot=bot,
+                first_chat_id=chats[0].id, first_timestamp=chats[0].timestamp,
+                last_chat_id=chats[-1].id, last_timestamp=chats[-1].timestamp,
+                row_count=len(chats), codec=codec, data=data
+            ))
+            await db.commit()
+            archived += len(chats)
+
+
+async def prune_summaries(keep: int = SUMMARY_RETENTION) -> int:
+    """Delete summaries beyond the newest `keep` per (user, bot)"""
+    ranked = select(
+        Summary.id,
+        func.row_number().over(
+            partition_by=(Summary.user_id, Summary.bot),
+            order_by=(Summary.created_at.desc(), Summary.id.desc())
+        ).label("rank")
+    ).subquery()
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(delete(Summary).where(
+            Summary.id.in_(select(ranked.c.id).where(ranked.c.rank > keep))
+        ).execution_options(synchronize_session=False))
+        await db.commit()
+    return result.rowcount
+
+
+async def compact(after_days: float = ARCHIVE_AFTER_DAYS) -> dict:
+    """One compaction pass over every conversation with enough old turns"""
+    cutoff = datetime.utcnow() - timedelta(days=after_days)
+    async with AsyncSessionLocal() as db:
+        conversations = (await db.execute(
+            select(Chat.user_id, Chat.bot).where(Chat.timestamp < cutoff)
+            .group_by(Chat.user_id, Chat.bot).having(func.count() >= ARCHIVE_MIN_BLOCK_ROWS)
+        )).all()
+    rows = 0
+    for user_id, bot in conversations:
+        rows += await archive_conversation(user_id, bot, cutoff)
+    return {"conversations": len(conversations), "rows_archived": rows, "summaries_pruned": await prune_summaries()}
+
+
+class ChatArchiver:
+    """Runs compaction in the background every interval"""
+
+    def __init__(self, enabled: bool = CHAT_ARCHIVE, interval_seconds: float = ARCHIVE_INTERVAL_SECONDS):
+        self.enabled = enabled
+        self.interval = interval_seconds
+        self._task = None
+        self._stats = {"runs": 0, "rows_archived": 0, "summaries_pruned": 0, "failures": 0}
+
+    async def start(self):
+        if self.enabled:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    def metrics(self):
+        return dict(self._stats, enabled=self.enabled)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                result = await compact()
+            except Exception as e:
+                self._stats["failures"] += 1
+                print(f"Chat compaction failed: {e}")
+                continue
+            self._stats["runs"] += 1
+            self._stats["rows_archived"] += result["rows_archived"]
+            self._stats["summaries_pruned"] += result["summaries_pruned"]
+            if result["rows_archived"] or result["summaries_pruned"]:
+                print(f"Compacted {result['rows_archived']} chats from {result['conversations']} conversations, "
+                      f"pruned {result['summaries_pruned']} summaries")
+
+
+chat_archiver = ChatArchiver()
+
+
+async def main():
+    try:
+        print(await compact())
+    finally:
+        # Pooled aiosqlite connections run on non-daemon threads; close them or the process never exits
+        await dispose_engines()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,81 @@
+import html
+import re
+
+from sqlalchemy import Boolean, DateTime, func, or_, select, text
+
+from database import Chat, DATABASE_URL, is_sqlite
+
+SEARCH_MAX_TERMS = 8
+SNIPPET_TOKENS = 16
+
+# Words are runs of \w plus Devanagari letters and matras (matras are not \w); the danda is excluded
+_TERM_RE = re.compile(r"[\w\u0900-\u0963\u0966-\u097f]+")
+_NUKTA = "\u093c"
+
+# Control characters can't appear in escaped text, so they mark highlights safely
+_MARK_OPEN, _MARK_CLOSE = "\x02", "\x03"
+
+_FTS_SEARCH_SQL = text(f"""
+    SELECT chats.id, chats.timestamp, chats.via_call,
+           snippet(chats_fts, 0, '{_MARK_OPEN}', '{_MARK_CLOSE}', '…', {SNIPPET_TOKENS}) AS message,
+           snippet(chats_fts, 1, '{_MARK_OPEN}', '{_MARK_CLOSE}', '…', {SNIPPET_TOKENS}) AS reply
+    FROM chats_fts JOIN chats ON chats.id = chats_fts.rowid
+    WHERE chats_fts MATCH :query
+    ORDER BY bm25(chats_fts, 1.0, 1.0, 0.0), chats.id DESC
+    LIMIT :limit OFFSET :offset
+""").columns(timestamp=DateTime, via_call=Boolean)
+
+
+def search_terms(q: str) -> list:
+    """Lowercased words without nuktas, matching how chats_fts indexes text"""
+    return _TERM_RE.findall(q.lower().replace(_NUKTA, ""))[:SEARCH_MAX_TERMS]
+
+
+def fts_query(user_id: int, bot: str, terms: list) -> str:
+    """FTS5 MATCH expression: every term as a prefix, scoped to one conversation.
+
+    Romanised Hinglish spellings vary ("zindagi"/"zindgi"), so prefixes catch
+    more of them than exact tokens. The terms are limited to the text columns,
+    or "aarav" (or "a") would match every row through the owner column.
+    """
+    return f"owner:{bot}{user_id} AND {{message reply}}: (" + " AND ".join(f'"{term}"*' for term in terms) + ")"
+
+
+def render_snippet(snippet: str) -> str:
+    return html.escape(snippet or "").replace(_MARK_OPEN, "<mark>").replace(_MARK_CLOSE, "</mark>")
+
+
+async def search_chats(db, user_id: int, bot: str, q: str, limit: int, offset: int = 0) -> list:
+    """Best-ranked matches first, each with HTML-escaped <mark> highlighted snippets"""
+    terms = search_terms(q)
+    if not terms:
+        return []
+    if not is_sqlite(DATABASE_URL):
+        return await search_chats_like(db, user_id, bot, terms, limit, offset)
+
+    rows = (await db.execute(_FTS_SEARCH_SQL, {
+        "query": fts_query(user_id, bot, terms), "limit": limit, "offset": offset
+    })).all()
+    return [{
+        "id": row.id,
+        "timestamp": row.timestamp.isoformat(),
+        "via_call": row.via_call,
+        "message": render_snippet(row.message),
+        "reply": render_snippet(row.reply),
+    } for row in rows]
+
+
+async def search_chats_like(db, user_id: int, bot: str, terms: list, limit: int, offset: int) -> list:
+    """Unranked fallback for databases without FTS5: newest matches first, whole texts"""
+    query = select(Chat).where(Chat.user_id == user_id, Chat.bot == bot)
+    message, reply = func.replace(Chat.message, _NUKTA, ""), func.replace(Chat.reply, _NUKTA, "")
+    for term in terms:
+        query = query.where(or_(message.ilike(f"%{term}%"), reply.ilike(f"%{term}%")))
+    chats = (await db.scalars(query.order_by(Chat.timestamp.desc(), Chat.id.desc()).limit(limit).offset(offset))).all()
+    return [{
+        "id": chat.id,
+        "timestamp": chat.timestamp.isoformat(),
+        "via_call": chat.via_call,
+        "message": html.escape(chat.message or ""),
+        "reply": html.escape(chat.reply or ""),
+    } for chat in chats]
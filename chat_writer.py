@@ -0,0 +1,144 @@
+import asyncio
+import os
+from collections import Counter
+
+from sqlalchemy import update
+
+from context_cache import context_cache
+from database import AsyncSessionLocal, ChatCounter
+from instrumentation import timed
+from summary_worker import summary_queue
+
+# Write-behind settings (overridable via environment)
+CHAT_WRITE_BEHIND = os.environ.get("CHAT_WRITE_BEHIND", "0") == "1"
+CHAT_FLUSH_INTERVAL_MS = float(os.environ.get("CHAT_FLUSH_INTERVAL_MS", 50))
+CHAT_FLUSH_MAX_ROWS = int(os.environ.get("CHAT_FLUSH_MAX_ROWS", 200))
+
+# A summary refresh is queued each time a conversation passes a multiple of this
+SUMMARY_EVERY_MESSAGES = 8
+
+
+async def increment_chat_counter(db, user_id: int, bot: str, count: int = 1) -> int:
+    """Bump the (user, bot) message counter in the current transaction and return it"""
+    total = await db.scalar(
+        update(ChatCounter).where(
+            ChatCounter.user_id == user_id,
+            ChatCounter.bot == bot
+        ).values(message_count=ChatCounter.message_count + count).returning(ChatCounter.message_count)
+    )
+    if total is None:
+        total = count
+        db.add(ChatCounter(user_id=user_id, bot=bot, message_count=total))
+    return total
+
+
+def summary_due(total: int, added: int = 1) -> bool:
+    return total // SUMMARY_EVERY_MESSAGES > (total - added) // SUMMARY_EVERY_MESSAGES
+
+
+class ChatWriteBuffer:
+    """Buffers Chat rows and commits them in batches every interval or max_rows.
+
+    Callers that read chats back from the database call flush_for(user_id)
+    first, which gives read-your-writes without merging pending rows (that
+    have no ids yet) into keyset-paginated results.
+    """
+
+    def __init__(self, enabled: bool = CHAT_WRITE_BEHIND, interval_ms: float = CHAT_FLUSH_INTERVAL_MS,
+                 max_rows: int = CHAT_FLUSH_MAX_ROWS, session_factory=AsyncSessionLocal):
+        self.enabled = enabled
+        self.interval = interval_ms / 1000
+        self.max_rows = max_rows
+        self.session_factory = session_factory
+        self._pending = []
+        self._pending_users = Counter()
+        self._wakeup = None
+        self._flush_lock = None
+        self._task = None
+        self._stopping = False
+        self._stats = {"flushes": 0, "rows": 0, "failures": 0}
+
+    async def start(self):
+        if not self.enabled:
+            return
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flusher and drain whatever is still buffered"""
+        if self._task is None:
+            return
+        # No cancel: a flush interrupted mid-commit could neither be retried nor dropped safely
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"Chat flush on shutdown failed, {len(self._pending)} rows lost: {e}")
+
+    def add(self, chat):
+        self._pending.append(chat)
+        self._pending_users[chat.user_id] += 1
+        if len(self._pending) >= self.max_rows and self._wakeup is not None:
+            self._wakeup.set()
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def flush_for(self, user_id: int):
+        if self._pending_users[user_id]:
+            await self.flush()
+
+    async def flush(self):
+        if not self.enabled:
+            return
+        async with self._flush_lock:
+            batch, self._pending = self._pending, []
+            if not batch:
+                return
+            added = Counter((chat.user_id, chat.bot) for chat in batch)
+            try:
+                with timed("db_flush"):
+                    async with self.session_factory() as db:
+                        db.add_all(batch)
+                        totals = {key: await increment_chat_counter(db, key[0], key[1], count) for key, count in added.items()}
+                        await db.commit()
+            except Exception:
+                # Keep arrival order and retry on the next tick
+                self._pending[:0] = batch
+                self._stats["failures"] += 1
+                raise
+            for chat in batch:
+                self._pending_users[chat.user_id] -= 1
+            self._pending_users += Counter()  # drop zero entries
+            self._stats["flushes"] += 1
+            self._stats["rows"] += len(batch)
+
+        for key, total in totals.items():
+            context_cache.committed(*key, total, added[key])
+            if summary_due(total, added[key]):
+                await summary_queue.enqueue(*key)
+
+    def metrics(self):
+        return dict(self._stats, pending=len(self._pending), enabled=self.enabled)
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Chat flush failed, retrying: {e}")
+                if not self._stopping:
+                    await asyncio.sleep(self.interval)
+
+
+chat_writer = ChatWriteBuffer()
@@ -0,0 +1,183 @@
+import os
+import time
+from collections import OrderedDict, deque
+from typing import NamedTuple
+
+from sqlalchemy import select, update
+
+from database import ChatCounter
+from llm_client import MAX_HISTORY_TURNS, MAX_SUMMARIES
+
+# Cache settings (overridable via environment)
+CONTEXT_CACHE_MAX_BYTES = int(os.environ.get("CONTEXT_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+# Idle entries expire; cross-worker changes are caught by the chat_counters stamp instead
+CONTEXT_CACHE_TTL_SECONDS = float(os.environ.get("CONTEXT_CACHE_TTL_SECONDS", 600))
+
+
+class CachedTurn(NamedTuple):
+    message: str
+    reply: str
+
+
+class CachedSummary(NamedTuple):
+    summary_text: str
+
+
+async def conversation_stamp(db, user_id: int, bot: str) -> tuple:
+    """(message_count, generation) from chat_counters, shared by every worker; (0, 0) before any chat"""
+    row = (await db.execute(
+        select(ChatCounter.message_count, ChatCounter.generation).where(
+            ChatCounter.user_id == user_id,
+            ChatCounter.bot == bot
+        )
+    )).first()
+    return tuple(row) if row is not None else (0, 0)
+
+
+async def bump_generation(db, user_id: int, bot: str):
+    """Mark (user, bot) changed for every worker in the current transaction; returns the new generation"""
+    return await db.scalar(
+        update(ChatCounter).where(
+            ChatCounter.user_id == user_id,
+            ChatCounter.bot == bot
+        ).values(generation=ChatCounter.generation + 1).returning(ChatCounter.generation)
+    )
+
+
+class ConversationContext:
+    """Ring buffer of recent turns plus the latest summaries for one (user, bot)"""
+
+    def __init__(self, turns, summaries, stamp: tuple):
+        self.stamp = stamp
+        self.turns = deque((CachedTurn(t.message, t.reply) for t in turns), maxlen=MAX_HISTORY_TURNS)
+        self.summaries = [CachedSummary(s.summary_text) for s in summaries][:MAX_SUMMARIES]
+        self.expires_at = time.monotonic() + CONTEXT_CACHE_TTL_SECONDS
+
+    def size(self) -> int:
+        # Rough payload size; good enough to bound memory, not exact accounting
+        return 200 + sum(len(t.message) + len(t.reply) for t in self.turns) + sum(len(s.summary_text) for s in self.summaries)
+
+
+class ContextCache:
+    """LRU of ConversationContexts, capped by approximate bytes, with write-through updates.
+
+    Each entry remembers the conversation_stamp it was loaded at and is only
+    served while the database still reports that stamp, so writes made by
+    other worker processes are never hidden. Local writes advance the stamp.
+    """
+
+    def __init__(self, max_bytes: int = CONTEXT_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        # Keys being loaded from the database -> True once a write lands mid-load
+        self._loading = {}
+        self._stats = {"hits": 0, "misses": 0, "stale": 0, "evictions": 0}
+
+    def get(self, user_id: int, bot: str, stamp: tuple):
+        """Return (turns oldest-first, summaries newest-first), or None on a miss"""
+        key = (user_id, bot)
+        context = self._entries.get(key)
+        if context is None or context.expires_at < time.monotonic() or context.stamp != stamp:
+            if context is not None:
+                if context.stamp != stamp:
+                    self._stats["stale"] += 1
+                self._drop(key)
+            self._stats["misses"] += 1
+            self._loading.setdefault(key, False)
+            return None
+        self._entries.move_to_end(key)
+        self._stats["hits"] += 1
+        return list(context.turns), list(context.summaries)
+
+    def put(self, user_id: int, bot: str, turns, summaries, stamp: tuple):
+        """Store a freshly loaded context unless a write raced with the load; stamp is read before loading"""
+        key = (user_id, bot)
+        if self._loading.pop(key, True):
+            return
+        self._drop(key)
+        context = ConversationContext(turns, summaries, stamp)
+        self._entries[key] = context
+        self._bytes += context.size()
+        self._evict()
+
+    def add_turn(self, user_id: int, bot: str, chat):
+        """Write-through for a Chat about to be saved; uncached conversations load fresh on next read.
+
+        The entry keeps its stamp until committed() reports the new message count.
+        """
+        context = self._written((user_id, bot))
+        if context is not None:
+            self._resize(context, lambda: context.turns.append(CachedTurn(chat.message, chat.reply)))
+
+    def committed(self, user_id: int, bot: str, message_count: int, added: int = 1):
+        """Advance the stamp once `added` write-through turns are committed at message_count"""
+        key = (user_id, bot)
+        context = self._entries.get(key)
+        if context is None:
+            return
+        count, generation = context.stamp
+        if count == message_count - added:
+            context.stamp = (message_count, generation)
+        else:
+            # Another worker saved turns in between that this entry never saw
+            self._drop(key)
+
+    def add_summary(self, user_id: int, bot: str, summary, generation: int):
+        """Write-through for a committed Summary; generation is the one its commit bumped to"""
+        key = (user_id, bot)
+        context = self._written(key)
+        if context is None:
+            return
+        count, cached_generation = context.stamp
+        if generation is None or cached_generation != generation - 1:
+            self._drop(key)
+            return
+        def prepend():
+            context.stamp = (count, generation)
+            context.summaries = [CachedSummary(summary.summary_text)] + context.summaries[:MAX_SUMMARIES - 1]
+        self._resize(context, prepend)
+
+    def invalidate(self, user_id: int, bot: str = None):
+        """Drop one conversation, or every conversation of the user when bot is None"""
+        def matches(key):
+            return key[0] == user_id and (bot is None or key[1] == bot)
+        for key in [key for key in self._entries if matches(key)]:
+            self._drop(key)
+        for key in self._loading:
+            if matches(key):
+                self._loading[key] = True
+
+    def metrics(self):
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return dict(
+            self._stats,
+            entries=len(self._entries),
+            bytes=self._bytes,
+            hit_rate=self._stats["hits"] / lookups if lookups else 0.0
+        )
+
+    def _written(self, key):
+        if key in self._loading:
+            self._loading[key] = True
+        return self._entries.get(key)
+
+    def _resize(self, context, mutate):
+        self._bytes -= context.size()
+        mutate()
+        self._bytes += context.size()
+        self._evict()
+
+    def _drop(self, key):
+        context = self._entries.pop(key, None)
+        if context is not None:
+            self._bytes -= context.size()
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and self._entries:
+            _, context = self._entries.popitem(last=False)
+            self._bytes -= context.size()
+            self._stats["evictions"] += 1
+
+
+context_cache = ContextCache()
@@ -0,0 +1,105 @@
+import re
+from typing import Optional
+
+from language_detector import detect_language_style
+
+# High-risk phrases in English, romanised Hindi/Hinglish and Devanagari.
+# Tuned for recall: a false positive costs one templated reply, a miss can cost far more.
+ENGLISH_PATTERNS = [
+    r"suicid(?:e|al)",
+    r"kill(?:ing)? my ?self",
+    r"take my (?:own )?life",
+    r"end(?:ing)? (?:my life|it all)",
+    r"(?:want|wanted|wanna|going) (?:to )?die",
+    r"wish i (?:was|were) dead",
+    r"better off dead",
+    r"(?:dont|do not) want to (?:live|be alive|wake up)",
+    r"no (?:reason|point) (?:to|in) (?:live|living|being alive)",
+    r"not worth living",
+    r"self ?-?harm",
+    r"(?:hurt|hurting|cut|cutting|harm|harming) my ?self",
+    r"hang my ?self",
+    r"overdos(?:e|ing)",
+    r"jump off (?:a|the) (?:building|bridge|roof)",
+]
+
+HINGLISH_PATTERNS = [
+    r"khud ?kushi",
+    r"aa?tm ?a?hatya",
+    r"mar(?:na|ne) (?:chahta|chahti|chahte|ka (?:mann?|dil))",
+    r"mar jaa?na (?:chahta|chahti|hai)",
+    r"mar (?:jaun|jau|jaunga|jaungi|jaaun)",
+    r"jee?(?:na|ne) (?:nahi|nhi) (?:chahta|chahti|hai)",
+    r"jee?ne ka (?:mann?|dil) (?:nahi|nhi)",
+    r"(?:khud|apne ?(?:aap)?) ko (?:khatam|khtm|maar (?:du|dun|doon|dunga|dungi|lu|lun|lunga|lungi|dalu|daalu))",
+    r"zindagi khatam",
+]
+
+# Devanagari matras are not \w, so these match as plain substrings (nuktas stripped first)
+DEVANAGARI_PATTERNS = [
+    "आत्महत्या",
+    "खुदकुशी",
+    "मरना चाहत",
+    "मर जाना चाहत",
+    "मरने का मन",
+    "मरने का दिल",
+    "जीना नहीं चाहत",
+    "जीने का मन नहीं",
+    "खुद को खत्म",
+    "खुद को मार",
+    "अपने आप को खत्म",
+    "जि(?:ं|न्)दगी खत्म",
+]
+
+_RISK_RE = re.compile(
+    r"\b(?:" + "|".join(ENGLISH_PATTERNS + HINGLISH_PATTERNS) + r")\b|" + "|".join(DEVANAGARI_PATTERNS)
+)
+_HINGLISH_RE = re.compile(r"\b(?:" + "|".join(HINGLISH_PATTERNS) + r")\b")
+
+# Drop apostrophes ("don't" -> "dont") and the Devanagari nukta ("ज़िंदगी" -> "जिंदगी")
+_NORMALIZE = str.maketrans({"'": None, "\u2019": None, "\u093c": None})
+
+CRISIS_REPLIES = {
+    "english": (
+        "I'm really glad you told me, and I'm so sorry you're hurting this much. "
+        "You don't have to face this alone. Please reach out right now to someone who can help:\n"
+        "- Emergency: 112\n"
+        "- Vandrevala Foundation: 9999 666 555 (24/7)\n"
+        "- AASRA: 9820 466 726 (24/7)\n"
+        "If you can, stay with someone you trust and move away from anything you could hurt yourself with. "
+        "I'm here with you. Are you safe right now?"
+    ),
+    "hinglish": (
+        "Mujhe bahut accha laga ki aapne mujhe bataya, aur mujhe dukh hai ki aap itna dard mehsoos kar rahe ho. "
+        "Aap akele nahi ho. Please abhi kisi se baat karo jo madad kar sake:\n"
+        "- Emergency: 112\n"
+        "- Vandrevala Foundation: 9999 666 555 (24/7)\n"
+        "- AASRA: 9820 466 726 (24/7)\n"
+        "Ho sake toh kisi bharosemand insaan ke saath raho aur aisi cheezon se door raho jinse aap khud ko nuksan pahuncha sako. "
+        "Main yahin hoon. Kya aap abhi safe ho?"
+    ),
+    "hindi_devanagari": (
+        "मुझे बहुत अच्छा लगा कि आपने मुझे बताया, और मुझे दुख है कि आप इतना दर्द महसूस कर रहे हैं। "
+        "आप अकेले नहीं हैं। कृपया अभी किसी से बात करें जो मदद कर सके:\n"
+        "- आपातकालीन: 112\n"
+        "- वंद्रेवाला फाउंडेशन: 9999 666 555 (24/7)\n"
+        "- AASRA: 9820 466 726 (24/7)\n"
+        "हो सके तो किसी भरोसेमंद व्यक्ति के साथ रहें और उन चीज़ों से दूर रहें जिनसे आप खुद को नुकसान पहुँचा सकते हैं। "
+        "मैं यहीं हूँ। क्या आप अभी सुरक्षित हैं?"
+    ),
+}
+
+
+def screen_message(message: str) -> Optional[str]:
+    """Return the matched high-risk phrase, or None; one regex pass over the message"""
+    match = _RISK_RE.search(message.lower().translate(_NORMALIZE))
+    return match.group(0) if match else None
+
+
+def crisis_reply(message: str) -> str:
+    """Templated crisis-resource reply in the user's language style"""
+    style = detect_language_style(message)
+    # Short messages like "marna chahta hoon" carry no style hints beyond the risk phrase itself
+    if style not in CRISIS_REPLIES and _HINGLISH_RE.search(message.lower().translate(_NORMALIZE)):
+        style = "hinglish"
+    return CRISIS_REPLIES.get(style, CRISIS_REPLIES["english"])
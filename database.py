@@ -1,14 +1,96 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text, Boolean, JSON
+from sqlalchemy import create_engine, event, Column, Integer, String, DateTime, Text, Boolean, JSON, LargeBinary, UniqueConstraint, Index
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from datetime import datetime
 import json
+import os
 
-DATABASE_URL = "sqlite:///sukoon.db"
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Set DATABASE_URL to swap in Postgres; READ_DATABASE_URL can point at a replica
+DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///sukoon.db")
+READ_DATABASE_URL = os.environ.get("READ_DATABASE_URL", DATABASE_URL)
+
+# "production" applies the tuned SQLite pragmas below; "default" leaves SQLite stock
+DB_PROFILE = os.environ.get("DB_PROFILE", "production")
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+DB_READ_POOL_SIZE = int(os.environ.get("DB_READ_POOL_SIZE", 10))
+
+SQLITE_PRAGMAS = {
+    "journal_mode": os.environ.get("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 5000)),
+    "mmap_size": int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+    # Negative cache_size is in KiB rather than pages
+    "cache_size": -int(os.environ.get("SQLITE_CACHE_SIZE_KB", 64 * 1024)),
+    "temp_store": "MEMORY",
+}
+
+def is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas: dict, read_only: bool = False):
+    cursor = dbapi_connection.cursor()
+    for name, value in pragmas.items():
+        cursor.execute(f"PRAGMA {name} = {value}")
+    if read_only:
+        cursor.execute("PRAGMA query_only = ON")
+    cursor.close()
+
+def install_sqlite_profile(sync_engine, profile: str = DB_PROFILE, read_only: bool = False):
+    """Run the profile's pragmas on every new pooled connection"""
+    pragmas = SQLITE_PRAGMAS if profile == "production" else {}
+    
+    @event.listens_for(sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        apply_sqlite_pragmas(dbapi_connection, pragmas, read_only)
+
+def make_engine(url: str = DATABASE_URL, profile: str = DB_PROFILE):
+    """Sync engine, used for schema creation, migrations and scripts"""
+    if not is_sqlite(url):
+        return create_engine(url, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_pre_ping=True)
+    sync_engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False},
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW
+    )
+    install_sqlite_profile(sync_engine, profile)
+    return sync_engine
+
+def to_async_url(url: str) -> str:
+    """Map a sync database URL onto its asyncio driver (aiosqlite / asyncpg)"""
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    if url.startswith("postgresql:") or url.startswith("postgres:"):
+        return "postgresql+asyncpg:" + url.split(":", 1)[1]
+    return url
+
+def make_async_engine(url: str = DATABASE_URL, profile: str = DB_PROFILE, pool_size: int = DB_POOL_SIZE, read_only: bool = False):
+    """Async engine with a sized pool; SQLite connections get the tuning profile"""
+    if not is_sqlite(url):
+        return create_async_engine(to_async_url(url), pool_size=pool_size, max_overflow=DB_MAX_OVERFLOW, pool_pre_ping=True)
+    # aiosqlite defaults to NullPool (a new connection per session); keep them warm instead
+    async_engine = create_async_engine(
+        to_async_url(url),
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=pool_size,
+        max_overflow=DB_MAX_OVERFLOW
+    )
+    install_sqlite_profile(async_engine.sync_engine, profile, read_only)
+    return async_engine
+
+engine = make_engine()
 Base = declarative_base()
 
+async_engine = make_async_engine()
+# expire_on_commit=False: attributes stay readable after commit without lazy IO
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Separate query_only pool for the history endpoints so long reads never queue behind writers
+read_async_engine = make_async_engine(READ_DATABASE_URL, pool_size=DB_READ_POOL_SIZE, read_only=True)
+AsyncReadSessionLocal = async_sessionmaker(read_async_engine, autoflush=False, expire_on_commit=False)
+
 class User(Base):
     __tablename__ = "users"
     
@@ -23,7 +105,10 @@ class User(Base):
     assessment_data = Column(JSON)
 
 class Chat(Base):
+    # Mirrored into the chats_fts search index by triggers (migrations/0005_chat_search.py)
     __tablename__ = "chats"
+    # Serves the per-conversation history queries: filter (user_id, bot), order by timestamp
+    __table_args__ = (Index("ix_chats_user_bot_timestamp", "user_id", "bot", "timestamp"),)
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, index=True)
@@ -33,21 +118,88 @@ class Chat(Base):
     timestamp = Column(DateTime, default=datetime.utcnow)
     via_call = Column(Boolean, default=False)
 
+class ChatArchive(Base):
+    """A compressed block of old chat turns for one (user, bot), oldest turn first"""
+    __tablename__ = "chat_archives"
+    # AUTOINCREMENT: block ids are never handed out again after a delete (decoded blocks are cached by id)
+    __table_args__ = (
+        Index("ix_chat_archives_user_bot_last", "user_id", "bot", "last_timestamp", "last_chat_id"),
+        {"sqlite_autoincrement": True},
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, nullable=False)
+    bot = Column(String, nullable=False)
+    first_chat_id = Column(Integer, nullable=False)
+    first_timestamp = Column(DateTime, nullable=False)
+    last_chat_id = Column(Integer, nullable=False)
+    last_timestamp = Column(DateTime, nullable=False)
+    row_count = Column(Integer, nullable=False)
+    codec = Column(String, nullable=False)  # 'zstd' or 'zlib'
+    data = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 class Summary(Base):
     __tablename__ = "summaries"
+    __table_args__ = (Index("ix_summaries_user_bot_created_at", "user_id", "bot", "created_at"),)
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, index=True)
     bot = Column(String)
     summary_text = Column(Text)
+    # Sparse hashed term counts for the memory index (see memory_index.encode_embedding)
+    embedding = Column(LargeBinary, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ChatCounter(Base):
+    """Running message count per (user, bot), maintained alongside chat inserts.
+
+    (message_count, generation) is the conversation's version as every worker sees
+    it: generation is bumped by new summaries, edited replies and deletes, which
+    reset the row rather than remove it so the version never repeats.
+    """
+    __tablename__ = "chat_counters"
+    
+    user_id = Column(Integer, primary_key=True)
+    bot = Column(String, primary_key=True)
+    message_count = Column(Integer, default=0, nullable=False)
+    generation = Column(Integer, default=0, nullable=False)
+
+class SummaryJob(Base):
+    __tablename__ = "summary_jobs"
+    __table_args__ = (UniqueConstraint("user_id", "bot", name="uq_summary_jobs_user_bot"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer)
+    bot = Column(String)
+    attempts = Column(Integer, default=0)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Lease held by the worker process running the job (see summary_worker.SummaryQueue)
+    claimed_by = Column(String, nullable=True)
+    claimed_at = Column(DateTime, nullable=True)
 
-def create_tables():
-    Base.metadata.create_all(bind=engine)
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_async_read_db():
+    async with AsyncReadSessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
+
+async def dispose_engines():
+    """Close pooled async connections (aiosqlite keeps a thread per connection)"""
+    await async_engine.dispose()
+    await read_async_engine.dispose()
+
+def reset_pools_after_fork():
+    """Forget pooled connections inherited from a parent process without closing them.
+
+    Engines are created at import, so a preloading launcher forks them along with
+    the app; the parent still owns those connections, and each child opens its own.
+    """
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
+    read_async_engine.sync_engine.dispose(close=False)
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=reset_pools_after_fork)
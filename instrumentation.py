@@ -0,0 +1,146 @@
+import contextvars
+import os
+import random
+import time
+from contextlib import contextmanager
+
+try:
+    from pyinstrument import Profiler
+except ImportError:  # profiling is optional
+    Profiler = None
+
+# Instrumentation settings (overridable via environment)
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Stages recorded while handling the current HTTP request, for Server-Timing
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram with a single label, rendered in Prometheus text format"""
+
+    def __init__(self, name: str, help_text: str, label: str, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = buckets
+        self._series = {}  # label value -> [per-bucket counts..., +Inf count, sum]
+
+    def observe(self, label_value: str, seconds: float):
+        series = self._series.get(label_value)
+        if series is None:
+            series = self._series[label_value] = [0] * (len(self.buckets) + 1) + [0.0]
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                series[i] += 1
+        series[-2] += 1
+        series[-1] += seconds
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for value, series in sorted(self._series.items()):
+            label = f'{self.label}="{value}"'
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {series[-2]}')
+            lines.append(f"{self.name}_sum{{{label}}} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{{{label}}} {series[-2]}")
+        return lines
+
+
+stage_seconds = Histogram("sukoon_stage_seconds", "Time spent in each stage of request handling", "stage")
+request_seconds = Histogram("sukoon_request_seconds", "End-to-end HTTP request time by endpoint", "endpoint")
+
+
+def record(stage: str, seconds: float):
+    """Add one stage timing to the histogram and to the current request, if any"""
+    stage_seconds.observe(stage, seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+@contextmanager
+def timed(stage: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - started)
+
+
+def server_timing(timings) -> str:
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings)
+
+
+def render_metrics(gauges: dict) -> str:
+    """Prometheus exposition: the histograms plus name -> (value, help) gauges"""
+    lines = []
+    for name, (value, help_text) in gauges.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value}"]
+    lines += stage_seconds.render()
+    lines += request_seconds.render()
+    return "\n".join(lines) + "\n"
+
+
+class InstrumentationMiddleware:
+    """ASGI middleware: per-request stage collection, Server-Timing header, sampled profiling.
+
+    Streaming responses send headers early, so their Server-Timing only covers
+    the stages finished before the first chunk; later stages still reach /metrics.
+    """
+
+    def __init__(self, app, profile_sample_rate: float = PROFILE_SAMPLE_RATE, profile_dir: str = PROFILE_DIR):
+        self.app = app
+        self.profile_sample_rate = profile_sample_rate if Profiler is not None else 0
+        self.profile_dir = profile_dir
+        self._profiling = False
+        if profile_sample_rate and Profiler is None:
+            print("PROFILE_SAMPLE_RATE is set but pyinstrument is not installed; profiling disabled")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = []
+        token = _request_timings.set(timings)
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                header = server_timing(timings + [("total", time.perf_counter() - started)])
+                message = dict(message, headers=list(message.get("headers", [])) + [(b"server-timing", header.encode())])
+            await send(message)
+
+        profiler = self._start_profiler()
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
+            endpoint = getattr(scope.get("endpoint"), "__name__", "unmatched")
+            request_seconds.observe(endpoint, time.perf_counter() - started)
+            if profiler is not None:
+                self._save_profile(profiler, endpoint)
+
+    def _start_profiler(self):
+        # One profile at a time keeps overhead bounded and the samples unambiguous
+        if self._profiling or not self.profile_sample_rate or random.random() >= self.profile_sample_rate:
+            return None
+        self._profiling = True
+        profiler = Profiler(async_mode="enabled")
+        profiler.start()
+        return profiler
+
+    def _save_profile(self, profiler, endpoint: str):
+        try:
+            profiler.stop()
+            os.makedirs(self.profile_dir, exist_ok=True)
+            path = os.path.join(self.profile_dir, f"{time.time_ns()}-{endpoint}.html")
+            with open(path, "w") as f:
+                f.write(profiler.output_html())
+        finally:
+            self._profiling = False
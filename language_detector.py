@@ -0,0 +1,78 @@
+import re
+
+# Common Hinglish words
+HINGLISH_WORDS = frozenset([
+    'kya', 'hai', 'haal', 'kaise', 'ho', 'bhai', 'yaar', 'acha', 'theek',
+    'nahi', 'haan', 'kuch', 'bhi', 'matlab', 'samjha', 'dekho', 'suno',
+    'chal', 'bas', 'abhi', 'phir', 'waise', 'kyun', 'kahan', 'kab',
+    'accha', 'thik', 'bilkul', 'sach', 'jhooth', 'paisa', 'ghar', 'mummy',
+    'papa', 'didi', 'bhaiya', 'aunty', 'uncle', 'ji', 'sahab', 'madam'
+])
+
+# Common Hindi/Urdu words in Roman script
+HINDI_ROMAN_WORDS = frozenset([
+    'namaste', 'namaskar', 'salaam', 'adaab', 'bhagwan', 'allah', 'ram',
+    'beta', 'baccha', 'ladka', 'ladki', 'shaadi', 'padhai', 'naukri',
+    'padhna', 'likhna', 'bolna', 'sunna', 'dekhna', 'jana', 'aana',
+    'khana', 'peena', 'sona', 'uthna', 'baithna', 'khada', 'chalna'
+])
+
+# Common English function words
+ENGLISH_WORDS = frozenset([
+    'the', 'and', 'is', 'are', 'was', 'were', 'have', 'has', 'will', 'would',
+    'should', 'could', 'i', 'im', 'am', 'you', 'my', 'me', 'it', 'to', 'of',
+    'in', 'on', 'for', 'with', 'not', 'do', 'dont', 'this', 'that', 'what',
+    'how', 'feel', 'feeling', 'today', 'about', 'can', 'cant'
+])
+
+# One lookup table instead of one substring scan per word
+WORD_CLASSES = {}
+for _word in ENGLISH_WORDS:
+    WORD_CLASSES[_word] = "english"
+for _word in HINGLISH_WORDS:
+    WORD_CLASSES[_word] = "hinglish"
+for _word in HINDI_ROMAN_WORDS:
+    WORD_CLASSES[_word] = "hindi_roman"
+
+# Devanagari runs or Latin words (apostrophes dropped so "don't" -> "dont")
+_TOKEN_RE = re.compile(r"[\u0900-\u097F]+|[a-z]+(?:'[a-z]+)*")
+
+
+def score_message(message: str) -> dict:
+    """Count word-boundary matches per class in a single pass over the message"""
+    scores = {"devanagari": 0, "hinglish": 0, "hindi_roman": 0, "english": 0}
+    for token in _TOKEN_RE.findall(message.lower()):
+        if token[0] >= '\u0900':
+            scores["devanagari"] += 1
+            continue
+        word_class = WORD_CLASSES.get(token.replace("'", ""))
+        if word_class:
+            scores[word_class] += 1
+    return scores
+
+
+def classify_scores(scores: dict) -> str:
+    if scores["devanagari"]:
+        return "hindi_devanagari"
+    elif scores["hinglish"] >= 2 or scores["hindi_roman"] >= 1:
+        return "hinglish"
+    elif scores["english"]:
+        return "english"
+    else:
+        return "mixed"
+
+
+def detect_language(message: str):
+    """Return (style, per-class scores) for one message"""
+    scores = score_message(message)
+    return classify_scores(scores), scores
+
+
+def detect_language_batch(messages):
+    """Classify many messages, e.g. for backfills or analytics"""
+    return [detect_language(message) for message in messages]
+
+
+def detect_language_style(message: str) -> str:
+    """Detect the language style of the user's message"""
+    return classify_scores(score_message(message))
@@ -1,9 +1,203 @@
-import requests
+import asyncio
+import httpx
 import json
+import math
 import os
+import random
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from functools import lru_cache
 from pathlib import Path
 import toml
 
+from language_detector import detect_language_style
+from instrumentation import record, timed
+
+# Shared HTTP client settings (overridable via environment)
+LLM_POOL_SIZE = int(os.environ.get("LLM_POOL_SIZE", 100))
+LLM_KEEPALIVE_CONNECTIONS = int(os.environ.get("LLM_KEEPALIVE_CONNECTIONS", 20))
+LLM_CONNECT_TIMEOUT = float(os.environ.get("LLM_CONNECT_TIMEOUT", 5))
+LLM_READ_TIMEOUT = float(os.environ.get("LLM_READ_TIMEOUT", 30))
+
+_http_client = None
+
+def _http2_available():
+    """HTTP/2 needs the optional 'h2' package"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+async def init_http_client():
+    """Create the shared, connection-pooled HTTP client (call once at startup)"""
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            http2=_http2_available(),
+            limits=httpx.Limits(
+                max_connections=LLM_POOL_SIZE,
+                max_keepalive_connections=LLM_KEEPALIVE_CONNECTIONS
+            ),
+            timeout=httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)
+        )
+    return _http_client
+
+async def close_http_client():
+    """Close the shared HTTP client (call once at shutdown)"""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+async def get_http_client():
+    """Return the shared HTTP client, creating it lazily if startup didn't"""
+    if _http_client is None:
+        return await init_http_client()
+    return _http_client
+
+# Upstream admission control (overridable via environment)
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", 16))
+LLM_RATE_PER_SECOND = float(os.environ.get("LLM_RATE_PER_SECOND", 8))
+LLM_RATE_BURST = int(os.environ.get("LLM_RATE_BURST", 16))
+LLM_QUEUE_DEADLINE_SECONDS = float(os.environ.get("LLM_QUEUE_DEADLINE_SECONDS", 10))
+
+class LLMOverloaded(Exception):
+    """The LLM gateway (or the upstream provider) can't take more work right now"""
+    
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class TokenBucket:
+    """Classic token bucket: refills at `rate` per second up to `burst`"""
+    
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self, deadline: float):
+        """Take one token, waiting for a refill; raises LLMOverloaded past the deadline"""
+        async with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < 1:
+                wait = (1 - self._tokens) / self.rate
+                if now + wait > deadline:
+                    raise LLMOverloaded("LLM rate limit reached", retry_after=math.ceil(wait))
+                await asyncio.sleep(wait)
+                self._tokens = 1.0
+                self._updated = time.monotonic()
+            self._tokens -= 1
+
+class LLMGateway:
+    """Global concurrency limit + rate limit with round-robin queuing per user.
+    
+    When every slot is busy, callers wait in a per-user queue; freed slots
+    are handed to users in turn, so one user sending many messages can't
+    starve the others. Waiting past the queue deadline raises LLMOverloaded.
+    """
+    
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, rate: float = LLM_RATE_PER_SECOND, burst: int = LLM_RATE_BURST, queue_deadline: float = LLM_QUEUE_DEADLINE_SECONDS):
+        self.max_concurrency = max_concurrency
+        self.queue_deadline = queue_deadline
+        self.bucket = TokenBucket(rate, burst)
+        self._active = 0
+        self._waiters = OrderedDict()  # user key -> deque of futures
+        self._queue_depth = 0
+        self._stats = {"admitted": 0, "rejected": 0, "wait_seconds_sum": 0.0, "wait_seconds_max": 0.0}
+    
+    async def acquire(self, user_key):
+        """Wait for a slot; the caller must call release() exactly once afterwards"""
+        started = time.monotonic()
+        deadline = started + self.queue_deadline
+        if self._active < self.max_concurrency and not self._waiters:
+            self._active += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self._waiters.setdefault(user_key, deque()).append(future)
+            self._queue_depth += 1
+            try:
+                await asyncio.wait_for(future, timeout=self.queue_deadline)
+            except asyncio.TimeoutError:
+                self._remove_waiter(user_key, future)
+                self._stats["rejected"] += 1
+                raise LLMOverloaded("Too many people are chatting right now, please retry shortly", retry_after=math.ceil(self.queue_deadline))
+            except asyncio.CancelledError:
+                # Client went away while queued; never leak a slot handed over meanwhile
+                if future.done() and not future.cancelled():
+                    self.release()
+                else:
+                    self._remove_waiter(user_key, future)
+                raise
+        try:
+            await self.bucket.acquire(deadline)
+        except LLMOverloaded:
+            self.release()
+            self._stats["rejected"] += 1
+            raise
+        waited = time.monotonic() - started
+        record("llm_queue", waited)
+        self._stats["admitted"] += 1
+        self._stats["wait_seconds_sum"] += waited
+        self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], waited)
+    
+    def release(self):
+        # Hand the slot straight to the next user in round-robin order
+        while self._waiters:
+            user_key, futures = next(iter(self._waiters.items()))
+            future = futures.popleft()
+            self._queue_depth -= 1
+            if futures:
+                self._waiters.move_to_end(user_key)
+            else:
+                del self._waiters[user_key]
+            if not future.done():
+                future.set_result(None)
+                return
+        self._active -= 1
+    
+    def _remove_waiter(self, user_key, future):
+        futures = self._waiters.get(user_key)
+        if futures and future in futures:
+            futures.remove(future)
+            self._queue_depth -= 1
+            if not futures:
+                del self._waiters[user_key]
+    
+    @asynccontextmanager
+    async def slot(self, user_key):
+        await self.acquire(user_key)
+        try:
+            yield
+        finally:
+            self.release()
+    
+    def metrics(self):
+        admitted = self._stats["admitted"]
+        return {
+            "active": self._active,
+            "queue_depth": self._queue_depth,
+            "queued_users": len(self._waiters),
+            "admitted_total": admitted,
+            "rejected_total": self._stats["rejected"],
+            "wait_seconds_avg": self._stats["wait_seconds_sum"] / admitted if admitted else 0.0,
+            "wait_seconds_max": self._stats["wait_seconds_max"]
+        }
+
+llm_gateway = LLMGateway()
+
+def _retry_after(response) -> int:
+    try:
+        return max(1, int(response.headers.get("Retry-After", 5)))
+    except ValueError:
+        return 5
+
 def load_api_key():
     """Load API key from secrets.toml or environment variable"""
     secrets_path = Path("secrets.toml")
@@ -86,144 +280,444 @@ SUMMARIZATION_PROMPT = """Create a personalized user profile summary for future
 
 Keep under 200 words. This will help provide personalized support in future chats."""
 
-async def chat_with_bot(bot_name: str, message: str, conversation_history: list = None, user_summaries: list = None):
-    """Send message to OpenRouter API and get response with personalization"""
-    api_key = load_api_key()
-    if not api_key:
-        raise ValueError("OpenRouter API key not found")
-    
-    url = "https://openrouter.ai/api/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
+OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+
+# Prompt budget settings (overridable via environment)
+PROMPT_TOKEN_BUDGET = int(os.environ.get("PROMPT_TOKEN_BUDGET", 3000))
+# Share of the leftover budget summaries may use before history gets the rest
+SUMMARY_BUDGET_SHARE = float(os.environ.get("SUMMARY_BUDGET_SHARE", 0.35))
+# Upper bounds on what callers need to fetch; the budget usually trims further
+MAX_HISTORY_TURNS = int(os.environ.get("MAX_HISTORY_TURNS", 12))
+MAX_SUMMARIES = int(os.environ.get("MAX_SUMMARIES", 3))
+# Per-message framing overhead in chat-format token accounting
+MESSAGE_TOKEN_OVERHEAD = 4
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except ImportError:
+    _encoding = None
+
+def estimate_tokens(text: str) -> int:
+    """Count tokens with tiktoken when installed, otherwise estimate.
+
+    The fallback assumes ~4 characters per token for Latin script and ~2 for
+    Devanagari and other non-ASCII text, which tokenizes less efficiently.
+    """
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    non_ascii = sum(1 for char in text if ord(char) > 127)
+    return (len(text) - non_ascii + 3) // 4 + (non_ascii + 1) // 2
+
+def _message_tokens(text: str) -> int:
+    return estimate_tokens(text) + MESSAGE_TOKEN_OVERHEAD
+
+@lru_cache(maxsize=64)
+def _base_prompt_tokens(base_prompt: str) -> int:
+    # Base prompts come from a small fixed set, so count each one once
+    return _message_tokens(base_prompt)
+
+def assemble_prompt(base_prompt: str, message: str, detected_style: str, conversation_history: list = None, user_summaries: list = None, budget: int = PROMPT_TOKEN_BUDGET):
+    """Fit summaries and history into the token budget, newest first.
+
+    conversation_history is oldest-first (as stored), user_summaries is
+    newest-first (as queried). Returns (messages, estimated_prompt_tokens).
+    """
+    used = _base_prompt_tokens(base_prompt) + _message_tokens(message)
+    remaining = max(budget - used, 0)
     
-    # Detect user's language style and adapt prompt
-    detected_style = detect_language_style(message)
-    system_content = await get_language_adaptive_prompt(bot_name, message, detected_style)
+    # Personalization from previous summaries, within their share of the budget
+    personalization_footer = f"\nUser's detected communication style: {detected_style}. Use this context to provide personalized, culturally appropriate responses matching their preferred language style."
+    summary_budget = int(remaining * SUMMARY_BUDGET_SHARE) - estimate_tokens(personalization_footer) - 12
+    chosen_summaries = []
+    for summary in (user_summaries or [])[:MAX_SUMMARIES]:
+        cost = estimate_tokens(summary.summary_text) + 4
+        if cost > summary_budget:
+            break
+        chosen_summaries.append(summary)
+        summary_budget -= cost
     
-    # Add personalization from previous summaries
-    if user_summaries:
-        recent_summaries = user_summaries[-3:]  # Last 3 summaries for context
+    system_content = base_prompt
+    if chosen_summaries:
         personalization = "\n\nPERSONALIZATION CONTEXT (from previous conversations):\n"
-        for i, summary in enumerate(recent_summaries, 1):
+        for i, summary in enumerate(reversed(chosen_summaries), 1):
             personalization += f"Session {i}: {summary.summary_text}\n"
-        personalization += f"\nUser's detected communication style: {detected_style}. Use this context to provide personalized, culturally appropriate responses matching their preferred language style."
+        personalization += personalization_footer
         system_content += personalization
+        personalization_tokens = estimate_tokens(personalization)
+        used += personalization_tokens
+        remaining -= personalization_tokens
     
-    messages = [{"role": "system", "content": system_content}]
-    
-    # Add recent conversation history (last 6 messages to manage token usage)
-    if conversation_history:
-        recent_history = conversation_history[-6:]
-        for chat in recent_history:
-            messages.append({"role": "user", "content": chat.message})
-            messages.append({"role": "assistant", "content": chat.reply})
+    # Recent conversation history, newest turns first, with whatever is left
+    chosen_turns = []
+    for chat in reversed((conversation_history or [])[-MAX_HISTORY_TURNS:]):
+        cost = _message_tokens(chat.message) + _message_tokens(chat.reply)
+        if cost > remaining:
+            break
+        chosen_turns.append(chat)
+        used += cost
+        remaining -= cost
     
+    messages = [{"role": "system", "content": system_content}]
+    for chat in reversed(chosen_turns):
+        messages.append({"role": "user", "content": chat.message})
+        messages.append({"role": "assistant", "content": chat.reply})
     messages.append({"role": "user", "content": message})
     
-    payload = {
-        "model": "deepseek/deepseek-chat-v3.1:free",
+    return messages, used
+
+async def build_chat_payload(bot_name: str, message: str, conversation_history: list = None, user_summaries: list = None, usage: dict = None):
+    """Build the OpenRouter request payload with personalization.
+
+    If a usage dict is passed, the estimated prompt token count is stored in it.
+    """
+    # Detect user's language style and adapt prompt
+    with timed("language_detection"):
+        detected_style = detect_language_style(message)
+    with timed("prompt_build"):
+        base_prompt = await get_language_adaptive_prompt(bot_name, message, detected_style)
+        messages, prompt_tokens = assemble_prompt(base_prompt, message, detected_style, conversation_history, user_summaries)
+    if usage is not None:
+        usage["prompt_tokens"] = prompt_tokens
+    
+    # The model is filled in per route by the router
+    return {
         "messages": messages,
         "temperature": 0.7,  # Slightly higher for more natural responses
         "max_tokens": 512
     }
+
+def _auth_headers():
+    api_key = load_api_key()
+    if not api_key:
+        raise ValueError("OpenRouter API key not found")
+    return {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
+
+# Upstream routing (overridable via environment). LLM_MODELS is a comma-separated
+# fallback list served from LLM_BASE_URL; LLM_PROVIDERS (JSON list of
+# {"url", "model", "api_key_env"}) overrides it for mixed providers.
+LLM_BASE_URL = os.environ.get("LLM_BASE_URL", OPENROUTER_URL)
+LLM_MODELS = os.environ.get("LLM_MODELS", "deepseek/deepseek-chat-v3.1:free")
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", 2))
+LLM_RETRY_BASE_SECONDS = float(os.environ.get("LLM_RETRY_BASE_SECONDS", 0.5))
+LLM_BREAKER_FAILURES = int(os.environ.get("LLM_BREAKER_FAILURES", 5))
+LLM_BREAKER_RESET_SECONDS = float(os.environ.get("LLM_BREAKER_RESET_SECONDS", 30))
+# Hedging: race a backup model when the primary is slower than its p95 to first byte
+LLM_HEDGING = os.environ.get("LLM_HEDGING", "0") == "1"
+LLM_HEDGE_DEFAULT_SECONDS = float(os.environ.get("LLM_HEDGE_DEFAULT_SECONDS", 4))
+LLM_HEDGE_MIN_SAMPLES = 20
+
+class UpstreamError(Exception):
+    """A failed upstream call; retryable for 429s, 5xx and transport errors"""
     
+    def __init__(self, message: str, retryable: bool, retry_after: int = None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """Opens after consecutive failures, then lets one trial call through after a cooldown"""
+    
+    def __init__(self, failure_threshold: int = LLM_BREAKER_FAILURES, reset_timeout: float = LLM_BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+    
+    def allow(self) -> bool:
+        """Whether a call may be attempted now (half_open means a trial is already in flight)"""
+        if self.state == "closed":
+            return True
+        return self.state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout
+    
+    def before_call(self):
+        if self.state == "open":
+            self.state = "half_open"
+    
+    def abandon_trial(self):
+        # A cancelled trial proves nothing; let the next caller try again
+        if self.state == "half_open":
+            self.state = "open"
+    
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self._opened_at + self.reset_timeout - time.monotonic()))
+    
+    def record_success(self):
+        self.state = "closed"
+        self._failures = 0
+    
+    def record_failure(self):
+        self._failures += 1
+        if self.state == "half_open" or self._failures >= self.failure_threshold:
+            self.state = "open"
+            self._opened_at = time.monotonic()
+
+class ModelRoute:
+    """One provider/model pair with its own breaker and latency windows.
+    
+    Streams are timed to the first delta and buffered calls to the whole
+    completion, so each kind hedges against its own p95.
+    """
+    
+    def __init__(self, url: str, model: str, api_key_env: str = None):
+        self.url = url
+        self.model = model
+        self.api_key_env = api_key_env
+        self.breaker = CircuitBreaker()
+        self._latency_seconds = {"stream": deque(maxlen=200), "buffered": deque(maxlen=200)}
+        self.stats = {"requests": 0, "failures": 0, "hedges_won": 0}
+    
+    def headers(self):
+        if self.api_key_env:
+            api_key = os.environ.get(self.api_key_env)
+            if not api_key:
+                raise ValueError(f"{self.api_key_env} not set for model {self.model}")
+            return {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+        return _auth_headers()
+    
+    def record_latency(self, kind: str, seconds: float):
+        self._latency_seconds[kind].append(seconds)
+    
+    def hedge_delay(self, kind: str) -> float:
+        """p95 latency for this kind of call once enough samples exist, else the configured default"""
+        samples = sorted(self._latency_seconds[kind])
+        if len(samples) < LLM_HEDGE_MIN_SAMPLES:
+            return LLM_HEDGE_DEFAULT_SECONDS
+        return samples[int(len(samples) * 0.95) - 1]
+    
+    def metrics(self):
+        return dict(self.stats, model=self.model, url=self.url, breaker=self.breaker.state, hedge_delay_seconds={kind: self.hedge_delay(kind) for kind in self._latency_seconds})
+
+def load_routes():
+    providers = os.environ.get("LLM_PROVIDERS")
+    if providers:
+        return [ModelRoute(p["url"], p["model"], p.get("api_key_env")) for p in json.loads(providers)]
+    return [ModelRoute(LLM_BASE_URL, model.strip()) for model in LLM_MODELS.split(",") if model.strip()]
+
+llm_routes = load_routes()
+
+def _classify_status(response):
+    """Turn an error status into UpstreamError; returns None for success"""
+    if response.status_code < 400:
+        return None
+    retryable = response.status_code == 429 or response.status_code >= 500
+    return UpstreamError(
+        f"API request failed: HTTP {response.status_code}",
+        retryable=retryable,
+        retry_after=_retry_after(response) if response.status_code == 429 else None
+    )
+
+def _call_kind(payload: dict) -> str:
+    return "stream" if payload.get("stream") else "buffered"
+
+async def _call_route(route: ModelRoute, payload: dict, start):
+    """Run one attempt against a route, keeping its breaker and latency stats current"""
+    route.stats["requests"] += 1
+    route.breaker.before_call()
+    started = time.monotonic()
+    try:
+        result = await start(route, dict(payload, model=route.model))
+    except asyncio.CancelledError:
+        route.breaker.abandon_trial()
+        raise
+    except UpstreamError as e:
+        route.stats["failures"] += 1
+        if e.retryable:
+            route.breaker.record_failure()
+        raise
+    except (httpx.TimeoutException, httpx.TransportError) as e:
+        route.stats["failures"] += 1
+        route.breaker.record_failure()
+        raise UpstreamError(f"API request failed: {str(e) or type(e).__name__}", retryable=True)
+    route.breaker.record_success()
+    route.record_latency(_call_kind(payload), time.monotonic() - started)
+    return result
+
+async def _race(routes: list, payload: dict, start, cleanup):
+    """Call routes[0]; if hedging and it is slower than its p95, also call routes[1].
+    
+    Returns the first successful result; the loser is cancelled, or passed to
+    cleanup if it also succeeded.
+    """
+    primary = asyncio.create_task(_call_route(routes[0], payload, start))
+    tasks = {primary: routes[0]}
+    winner = None
+    try:
+        if LLM_HEDGING and len(routes) > 1:
+            done, _ = await asyncio.wait({primary}, timeout=routes[0].hedge_delay(_call_kind(payload)))
+            if not done:
+                tasks[asyncio.create_task(_call_route(routes[1], payload, start))] = routes[1]
+        
+        error = None
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    winner = task
+                    if len(tasks) > 1:
+                        tasks[task].stats["hedges_won"] += 1
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            if task is winner:
+                continue
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled() and task.exception() is None:
+                await cleanup(task.result())
+
+async def _route_request(payload: dict, start, cleanup=None):
+    """Send payload through the routing table with jittered retries on 429/5xx"""
+    cleanup = cleanup or _noop_cleanup
+    last_error = None
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        routes = [route for route in llm_routes if route.breaker.allow()]
+        if not routes:
+            retry_after = min(route.breaker.retry_after() for route in llm_routes)
+            raise LLMOverloaded("The AI service is temporarily unavailable, please retry shortly", retry_after=retry_after)
+        # Rotate so each retry leads with the next model in the fallback list
+        shift = attempt % len(routes)
+        routes = routes[shift:] + routes[:shift]
+        try:
+            return await _race(routes, payload, start, cleanup)
+        except UpstreamError as e:
+            if not e.retryable:
+                raise Exception(str(e))
+            last_error = e
+            if attempt < LLM_MAX_RETRIES:
+                # Full jitter, but never sooner than the provider asked for
+                delay = random.uniform(0, LLM_RETRY_BASE_SECONDS * (2 ** attempt))
+                await asyncio.sleep(max(delay, min(e.retry_after or 0, LLM_RETRY_BASE_SECONDS * 4)))
+    if last_error.retry_after:
+        raise LLMOverloaded("The AI service is busy, please retry shortly", retry_after=last_error.retry_after)
+    raise Exception(str(last_error))
+
+async def _noop_cleanup(result):
+    pass
+
+async def _start_completion(route: ModelRoute, payload: dict):
+    client = await get_http_client()
+    response = await client.post(route.url, headers=route.headers(), json=payload)
+    error = _classify_status(response)
+    if error:
+        raise error
+    return response.json()
+
+async def _iter_deltas(response):
+    async for line in response.aiter_lines():
+        # SSE: skip keep-alive comments and blank separators
+        if not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            break
+        chunk = json.loads(data)
+        delta = chunk["choices"][0].get("delta", {}).get("content")
+        if delta:
+            yield delta
+
+async def _start_stream(route: ModelRoute, payload: dict):
+    """Open a streaming completion and read up to its first delta"""
+    client = await get_http_client()
+    request = client.build_request("POST", route.url, headers=route.headers(), json=payload)
+    response = await client.send(request, stream=True)
+    try:
+        error = _classify_status(response)
+        if error:
+            raise error
+        deltas = _iter_deltas(response)
+        first = await deltas.__anext__()
+    except StopAsyncIteration:
+        first = None
+    except BaseException:
+        await response.aclose()
+        raise
+    return response, deltas, first
+
+async def _close_stream(opened):
+    await opened[0].aclose()
+
+async def chat_with_bot(bot_name: str, message: str, conversation_history: list = None, user_summaries: list = None, usage: dict = None):
+    """Send message to OpenRouter API and get response with personalization"""
+    payload = await build_chat_payload(bot_name, message, conversation_history, user_summaries, usage)
+    
+    with timed("llm_total"):
+        result = await _route_request(payload, _start_completion)
     try:
-        response = requests.post(url, headers=headers, json=payload, timeout=30)
-        response.raise_for_status()
-        result = response.json()
         return result["choices"][0]["message"]["content"]
-    except requests.exceptions.RequestException as e:
+    except (KeyError, IndexError) as e:
+        raise Exception(f"Unexpected API response format: {str(e)}")
+
+async def stream_chat_with_bot(bot_name: str, message: str, conversation_history: list = None, user_summaries: list = None, usage: dict = None):
+    """Stream the bot response from OpenRouter, yielding text deltas as they arrive"""
+    payload = await build_chat_payload(bot_name, message, conversation_history, user_summaries, usage)
+    payload["stream"] = True
+    
+    # Retries and hedging only apply up to the first delta; after that we're committed
+    started = time.perf_counter()
+    response, deltas, first = await _route_request(payload, _start_stream, _close_stream)
+    record("llm_first_byte", time.perf_counter() - started)
+    try:
+        if first:
+            yield first
+        async for delta in deltas:
+            yield delta
+    except httpx.HTTPError as e:
         raise Exception(f"API request failed: {str(e)}")
-    except KeyError as e:
+    except (KeyError, IndexError, ValueError) as e:
         raise Exception(f"Unexpected API response format: {str(e)}")
+    finally:
+        await response.aclose()
+        record("llm_total", time.perf_counter() - started)
 
 async def summarize_conversation(bot_name: str, conversation_history: list):
     """Generate a summary of the conversation"""
-    api_key = load_api_key()
-    if not api_key:
-        raise ValueError("OpenRouter API key not found")
-    
     # Create conversation text
     conv_text = ""
     for chat in conversation_history[-10:]:  # Last 10 messages
         conv_text += f"User: {chat.message}\n{bot_name.title()}: {chat.reply}\n\n"
     
-    url = "https://openrouter.ai/api/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-    
     messages = [
         {"role": "system", "content": SUMMARIZATION_PROMPT},
         {"role": "user", "content": f"Conversation to summarize:\n\n{conv_text}"}
     ]
     
     payload = {
-        "model": "deepseek/deepseek-chat-v3.1:free",
         "messages": messages,
         "temperature": 0.3,
         "max_tokens": 200
     }
     
     try:
-        response = requests.post(url, headers=headers, json=payload, timeout=30)
-        response.raise_for_status()
-        result = response.json()
+        result = await _route_request(payload, _start_completion)
         return result["choices"][0]["message"]["content"]
     except Exception as e:
         raise Exception(f"Summarization failed: {str(e)}")
 
-def detect_language_style(message: str) -> str:
-    """Detect the language style of the user's message"""
-    message_lower = message.lower()
-    
-    # Hindi/Devanagari script detection
-    hindi_chars = any('\u0900' <= char <= '\u097F' for char in message)
-    
-    # Common Hinglish words
-    hinglish_words = [
-        'kya', 'hai', 'haal', 'kaise', 'ho', 'bhai', 'yaar', 'acha', 'theek', 
-        'nahi', 'haan', 'kuch', 'bhi', 'matlab', 'samjha', 'dekho', 'suno',
-        'chal', 'bas', 'abhi', 'phir', 'waise', 'kyun', 'kahan', 'kab',
-        'accha', 'thik', 'bilkul', 'sach', 'jhooth', 'paisa', 'ghar', 'mummy',
-        'papa', 'didi', 'bhaiya', 'aunty', 'uncle', 'ji', 'sahab', 'madam'
-    ]
+LANGUAGE_INSTRUCTIONS = {
+    "hindi_devanagari": "\n\nIMPORTANT: User prefers Hindi in Devanagari script. Respond primarily in Hindi with Devanagari script, but you can mix some English words naturally as Indians do.",
     
-    # Common Hindi/Urdu words in Roman script
-    hindi_roman_words = [
-        'namaste', 'namaskar', 'salaam', 'adaab', 'bhagwan', 'allah', 'ram',
-        'beta', 'baccha', 'ladka', 'ladki', 'shaadi', 'padhai', 'naukri',
-        'padhna', 'likhna', 'bolna', 'sunna', 'dekhna', 'jana', 'aana',
-        'khana', 'peena', 'sona', 'uthna', 'baithna', 'khada', 'chalna'
-    ]
+    "hinglish": "\n\nIMPORTANT: User prefers Hinglish (Hindi-English mix). Respond in natural Hinglish style mixing Hindi and English words fluidly like: 'Yaar, that's really tough. Main samajh sakta hun how stressful ye situation hai.'",
     
-    hinglish_count = sum(1 for word in hinglish_words if word in message_lower)
-    hindi_roman_count = sum(1 for word in hindi_roman_words if word in message_lower)
+    "english": "\n\nIMPORTANT: User prefers English. Respond in clear English but feel free to use Indian cultural references and occasional Hindi words that are commonly understood.",
     
-    if hindi_chars:
-        return "hindi_devanagari"
-    elif hinglish_count >= 2 or hindi_roman_count >= 1:
-        return "hinglish"
-    elif any(word in message_lower for word in ['the', 'and', 'is', 'are', 'was', 'were', 'have', 'has', 'will', 'would', 'should', 'could']):
-        return "english"
-    else:
-        return "mixed"
+    "mixed": "\n\nIMPORTANT: User uses mixed language style. Mirror their communication pattern and adapt your language to match their style naturally."
+}
+
+# Base prompts for every (bot, style) pair, built once at import
+BASE_PROMPTS = {
+    (bot_name, style): SYSTEM_PROMPTS[bot_name] + instruction
+    for bot_name in SYSTEM_PROMPTS
+    for style, instruction in LANGUAGE_INSTRUCTIONS.items()
+}
 
 async def get_language_adaptive_prompt(bot_name: str, user_message: str, detected_style: str) -> str:
     """Get language-adaptive system prompt based on user's communication style"""
-    base_prompt = SYSTEM_PROMPTS[bot_name]
-    
-    language_instructions = {
-        "hindi_devanagari": "\n\nIMPORTANT: User prefers Hindi in Devanagari script. Respond primarily in Hindi with Devanagari script, but you can mix some English words naturally as Indians do.",
-        
-        "hinglish": "\n\nIMPORTANT: User prefers Hinglish (Hindi-English mix). Respond in natural Hinglish style mixing Hindi and English words fluidly like: 'Yaar, that's really tough. Main samajh sakta hun how stressful ye situation hai.'",
-        
-        "english": "\n\nIMPORTANT: User prefers English. Respond in clear English but feel free to use Indian cultural references and occasional Hindi words that are commonly understood.",
-        
-        "mixed": "\n\nIMPORTANT: User uses mixed language style. Mirror their communication pattern and adapt your language to match their style naturally."
-    }
-    
-    return base_prompt + language_instructions.get(detected_style, language_instructions["mixed"])
\ No newline at end of file
+    return BASE_PROMPTS.get((bot_name, detected_style)) or BASE_PROMPTS[(bot_name, "mixed")]
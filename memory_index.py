@@ -0,0 +1,233 @@
+import math
+import os
+import re
+import time
+import zlib
+from array import array
+from collections import Counter, OrderedDict
+from typing import NamedTuple
+
+from sqlalchemy import select
+
+from database import Summary
+from instrumentation import timed
+from llm_client import MAX_SUMMARIES
+
+try:
+    import numpy as np
+except ImportError:  # scoring falls back to sparse dot products in pure Python
+    np = None
+
+# Memory index settings (overridable via environment)
+MEMORY_INDEX = os.environ.get("MEMORY_INDEX", "1") == "1"
+MEMORY_MAX_SUMMARIES = int(os.environ.get("MEMORY_MAX_SUMMARIES", 32))
+MEMORY_MIN_SCORE = float(os.environ.get("MEMORY_MIN_SCORE", 0.05))
+MEMORY_CACHE_MAX_BYTES = int(os.environ.get("MEMORY_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+MEMORY_CACHE_TTL_SECONDS = float(os.environ.get("MEMORY_CACHE_TTL_SECONDS", 600))
+
+# Hashed feature space; stored embeddings depend on it, so changing it means re-embedding
+MEMORY_DIM = 2048
+
+# Words (Devanagari matras included) plus their character trigrams, so Hinglish
+# spelling variants like "zindagi"/"zindgi" and inflections still overlap
+_WORD_RE = re.compile(r"[\w\u0900-\u0963\u0966-\u097f]+")
+_NORMALIZE = str.maketrans({"'": None, "\u2019": None, "\u093c": None})
+
+
+class MemoryItem(NamedTuple):
+    summary_id: int
+    summary_text: str
+
+
+def features(text: str) -> Counter:
+    """Hashed term counts; crc32 keeps buckets identical across processes"""
+    counts = Counter()
+    for word in _WORD_RE.findall(text.lower().translate(_NORMALIZE)):
+        counts[zlib.crc32(word.encode()) % MEMORY_DIM] += 1
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            counts[zlib.crc32(padded[i:i + 3].encode()) % MEMORY_DIM] += 1
+    return counts
+
+
+def encode_embedding(text: str) -> bytes:
+    """Compact sparse embedding for Summary.embedding: uint16 buckets then uint16 counts"""
+    counts = features(text)
+    buckets = sorted(counts)
+    return array("H", buckets).tobytes() + array("H", (min(counts[b], 65535) for b in buckets)).tobytes()
+
+
+def decode_embedding(data: bytes) -> dict:
+    values = array("H")
+    values.frombytes(data)
+    half = len(values) // 2
+    return dict(zip(values[:half], values[half:]))
+
+
+class ConversationMemory:
+    """TF-IDF weighted, L2-normalized summary vectors for one (user, bot), newest first.
+
+    IDF is computed over the conversation's own summaries, which damps the
+    boilerplate every summary shares ("the user", "feeling") in favour of topics.
+    """
+
+    def __init__(self, items, vectors, generation: int):
+        self.generation = generation
+        self.items = list(items)
+        self.vectors = list(vectors)
+        self.expires_at = time.monotonic() + MEMORY_CACHE_TTL_SECONDS
+        self._build()
+
+    def _build(self):
+        n = len(self.vectors)
+        df = Counter(bucket for vector in self.vectors for bucket in vector)
+        self.idf = {bucket: math.log((1 + n) / (1 + count)) + 1 for bucket, count in df.items()}
+        if np is not None:
+            self.idf_array = np.ones(MEMORY_DIM, dtype=np.float32)
+            self.idf_array[list(self.idf)] = list(self.idf.values())
+            self.matrix = np.zeros((n, MEMORY_DIM), dtype=np.float32)
+            for row, vector in enumerate(self.vectors):
+                self.matrix[row, list(vector)] = [1 + math.log(count) for count in vector.values()]
+            self.matrix *= self.idf_array
+            norms = np.linalg.norm(self.matrix, axis=1, keepdims=True)
+            self.matrix /= np.maximum(norms, 1e-9)
+        else:
+            self.rows = [_normalize({b: (1 + math.log(c)) * self.idf[b] for b, c in vector.items()}) for vector in self.vectors]
+
+    def add(self, item, vector):
+        self.items = [item] + self.items[:MEMORY_MAX_SUMMARIES - 1]
+        self.vectors = [vector] + self.vectors[:MEMORY_MAX_SUMMARIES - 1]
+        self._build()
+
+    def scores(self, query: Counter) -> list:
+        """Cosine similarity of the query against every summary, one batched product"""
+        if np is not None:
+            q = np.zeros(MEMORY_DIM, dtype=np.float32)
+            q[list(query)] = [1 + math.log(count) for count in query.values()]
+            q *= self.idf_array
+            q /= max(float(np.linalg.norm(q)), 1e-9)
+            return (self.matrix @ q).tolist()
+        q = _normalize({b: (1 + math.log(c)) * self.idf.get(b, 1.0) for b, c in query.items()})
+        return [sum(weight * row.get(bucket, 0.0) for bucket, weight in q.items()) for row in self.rows]
+
+    def select(self, message: str, k: int) -> list:
+        """Positions of the newest summary plus the k - 1 best matches above MEMORY_MIN_SCORE"""
+        if not self.items or k < 1:
+            return []
+        scores = self.scores(features(message))
+        ranked = sorted(range(1, len(scores)), key=scores.__getitem__, reverse=True)
+        return [0] + [i for i in ranked[:k - 1] if scores[i] >= MEMORY_MIN_SCORE]
+
+    def size(self) -> int:
+        # Dense matrix plus texts and sparse vectors; approximate, like the context cache
+        vectors = sum(len(vector) for vector in self.vectors) * 16
+        return 200 + len(self.items) * MEMORY_DIM * 4 + vectors + sum(len(item.summary_text) for item in self.items)
+
+
+def _normalize(vector: dict) -> dict:
+    norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+    return {bucket: weight / norm for bucket, weight in vector.items()}
+
+
+class MemoryIndex:
+    """Per-conversation summary memory: picks the summaries relevant to the current message.
+
+    The newest summary is always kept for continuity; the remaining slots go to
+    the best cosine matches above MEMORY_MIN_SCORE. Conversations are loaded
+    lazily and held in a byte-capped LRU with write-through on new summaries,
+    and served only while chat_counters still reports the generation they were
+    loaded at (see context_cache.conversation_stamp), so every worker sees
+    summaries and deletes made by the others.
+    """
+
+    def __init__(self, enabled: bool = MEMORY_INDEX, max_bytes: int = MEMORY_CACHE_MAX_BYTES):
+        self.enabled = enabled
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._loading = {}
+        self._stats = {"hits": 0, "misses": 0, "stale": 0, "evictions": 0}
+
+    async def relevant(self, db, user_id: int, bot: str, message: str, generation: int, k: int = MAX_SUMMARIES) -> list:
+        """Up to k MemoryItems in priority order (newest summary first, then by relevance)"""
+        memory = await self._memory(db, user_id, bot, generation)
+        with timed("memory_rank"):
+            return [memory.items[i] for i in memory.select(message, k)]
+
+    def add_summary(self, user_id: int, bot: str, summary, generation: int):
+        """Write-through for a newly stored Summary; generation is the one its commit bumped to"""
+        key = (user_id, bot)
+        if key in self._loading:
+            self._loading[key] = True
+        memory = self._entries.get(key)
+        if memory is not None and (generation is None or memory.generation != generation - 1):
+            self._drop(key)
+        elif memory is not None:
+            memory.generation = generation
+            self._bytes -= memory.size()
+            memory.add(MemoryItem(summary.id, summary.summary_text), _vector(summary))
+            self._bytes += memory.size()
+            self._evict()
+
+    def invalidate(self, user_id: int, bot: str = None):
+        def matches(key):
+            return key[0] == user_id and (bot is None or key[1] == bot)
+        for key in [key for key in self._entries if matches(key)]:
+            self._drop(key)
+        for key in self._loading:
+            if matches(key):
+                self._loading[key] = True
+
+    def metrics(self):
+        return dict(self._stats, entries=len(self._entries), bytes=self._bytes, numpy=np is not None)
+
+    async def _memory(self, db, user_id: int, bot: str, generation: int) -> ConversationMemory:
+        key = (user_id, bot)
+        memory = self._entries.get(key)
+        if memory is not None and memory.expires_at >= time.monotonic() and memory.generation == generation:
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return memory
+        if memory is not None and memory.generation != generation:
+            self._stats["stale"] += 1
+
+        self._stats["misses"] += 1
+        self._loading.setdefault(key, False)
+        with timed("memory_fetch"):
+            summaries = (await db.scalars(
+                select(Summary).where(Summary.user_id == user_id, Summary.bot == bot)
+                .order_by(Summary.created_at.desc(), Summary.id.desc()).limit(MEMORY_MAX_SUMMARIES)
+            )).all()
+        memory = ConversationMemory(
+            (MemoryItem(summary.id, summary.summary_text) for summary in summaries),
+            (_vector(summary) for summary in summaries),
+            generation
+        )
+        # Like the context cache: a summary written mid-load means this snapshot may be stale
+        if not self._loading.pop(key, True):
+            self._drop(key)
+            self._entries[key] = memory
+            self._bytes += memory.size()
+            self._evict()
+        return memory
+
+    def _drop(self, key):
+        memory = self._entries.pop(key, None)
+        if memory is not None:
+            self._bytes -= memory.size()
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and self._entries:
+            _, memory = self._entries.popitem(last=False)
+            self._bytes -= memory.size()
+            self._stats["evictions"] += 1
+
+
+def _vector(summary) -> dict:
+    # Summaries written before the memory index have no stored embedding yet
+    if summary.embedding:
+        return decode_embedding(summary.embedding)
+    return dict(features(summary.summary_text))
+
+
+memory_index = MemoryIndex()
@@ -1,64 +1,184 @@
 #!/usr/bin/env python3
 """
-Database migration script to add new user fields.
-Run this once to update your existing database schema.
+Versioned schema migrations for DATABASE_URL.
+
+Migrations live in migrations/NNNN_name.py and run in order; applied
+versions are recorded in schema_version. A migration's upgrade() does the
+quick schema change in one transaction. Its optional backfill() then
+rewrites data in small batches, each in its own transaction, with
+progress kept in schema_backfills so an interrupted run resumes.
+
+The app runs pending upgrades at startup and the backfills in the
+background. Running it by hand:
+
+    python migrate_db.py                  # upgrade, then run backfills to completion
+    python migrate_db.py --status
+    python migrate_db.py --batch-size 500
 """
 
-import sqlite3
+import argparse
+import importlib
 import os
+import re
+import threading
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from database import engine
+
+# Migration settings (overridable via environment)
+MIGRATION_BATCH_SIZE = int(os.environ.get("MIGRATION_BATCH_SIZE", 1000))
+# Pause between background backfill batches so app writers get the write lock in between
+MIGRATION_BATCH_PAUSE_MS = float(os.environ.get("MIGRATION_BATCH_PAUSE_MS", 20))
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+_MIGRATION_FILE = re.compile(r"^(\d{4})_(\w+)\.py$")
+
+BOOKKEEPING_DDL = [
+    """CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        name VARCHAR NOT NULL,
+        applied_at TIMESTAMP NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS schema_backfills (
+        version INTEGER PRIMARY KEY,
+        last_id INTEGER NOT NULL,
+        done BOOLEAN NOT NULL,
+        updated_at TIMESTAMP NOT NULL
+    )""",
+]
 
-def migrate_database():
-    db_path = "sukoon.db"
-    
-    if not os.path.exists(db_path):
-        print("Database doesn't exist yet. No migration needed.")
-        return
-    
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    try:
-        # Check if new columns already exist
-        cursor.execute("PRAGMA table_info(users)")
-        columns = [column[1] for column in cursor.fetchall()]
-        
-        # Add missing columns
-        if 'email' not in columns:
-            print("Adding email column...")
-            cursor.execute("ALTER TABLE users ADD COLUMN email TEXT")
-            
-        if 'full_name' not in columns:
-            print("Adding full_name column...")
-            cursor.execute("ALTER TABLE users ADD COLUMN full_name TEXT")
-            
-        if 'age' not in columns:
-            print("Adding age column...")
-            cursor.execute("ALTER TABLE users ADD COLUMN age INTEGER")
-            
-        if 'gender' not in columns:
-            print("Adding gender column...")
-            cursor.execute("ALTER TABLE users ADD COLUMN gender TEXT")
-        
-        # For existing users, set email = username if email is null
-        cursor.execute("UPDATE users SET email = username WHERE email IS NULL")
-        
-        # Create unique index on email if it doesn't exist
+
+def discover():
+    """[(version, name, module)] for every migration file, in version order"""
+    migrations = []
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        match = _MIGRATION_FILE.match(filename)
+        if match:
+            module = importlib.import_module(f"migrations.{filename[:-3]}")
+            migrations.append((int(match.group(1)), match.group(2), module))
+    return migrations
+
+
+def _bookkeeping(conn) -> set:
+    for statement in BOOKKEEPING_DDL:
+        conn.execute(text(statement))
+    return set(conn.execute(text("SELECT version FROM schema_version")).scalars())
+
+
+def upgrade_schema(db_engine=engine) -> list:
+    """Apply pending migrations' upgrade() steps; returns the versions applied"""
+    with db_engine.begin() as conn:
+        done = _bookkeeping(conn)
+
+    applied = []
+    for version, name, module in discover():
+        if version in done:
+            continue
         try:
-            cursor.execute("CREATE UNIQUE INDEX idx_users_email ON users(email)")
-            print("Created unique index on email column")
-        except sqlite3.OperationalError as e:
-            if "already exists" not in str(e):
-                raise
-        
-        conn.commit()
-        print("Database migration completed successfully!")
-        
-    except Exception as e:
-        print(f"Migration failed: {e}")
-        conn.rollback()
-        raise
-    finally:
-        conn.close()
+            with db_engine.begin() as conn:
+                # Recording the version first takes the write lock, so of several
+                # workers starting at once only one runs each migration
+                conn.execute(text("INSERT INTO schema_version (version, name, applied_at) VALUES (:v, :n, :t)"),
+                             {"v": version, "n": name, "t": datetime.utcnow()})
+                module.upgrade(conn)
+                if hasattr(module, "backfill"):
+                    conn.execute(text("INSERT INTO schema_backfills (version, last_id, done, updated_at) VALUES (:v, 0, :d, :t)"),
+                                 {"v": version, "d": False, "t": datetime.utcnow()})
+        except IntegrityError:
+            continue  # another process applied it first
+        print(f"Applied migration {version:04d}_{name}")
+        applied.append(version)
+    return applied
+
+
+def run_backfills(db_engine=engine, batch_size: int = MIGRATION_BATCH_SIZE, stop: threading.Event = None,
+                  pause_seconds: float = 0) -> int:
+    """Run unfinished backfills batch by batch until done or stop is set; returns batches run"""
+    modules = {version: (name, module) for version, name, module in discover()}
+    with db_engine.connect() as conn:
+        pending = list(conn.execute(text("SELECT version FROM schema_backfills WHERE done = :d ORDER BY version"),
+                                    {"d": False}).scalars())
+    batches = 0
+    for version in pending:
+        name, module = modules[version]
+        while stop is None or not stop.is_set():
+            with db_engine.begin() as conn:
+                # The no-op update takes the write lock before progress is read,
+                # so concurrent runners never process the same batch twice
+                conn.execute(text("UPDATE schema_backfills SET last_id = last_id WHERE version = :v"), {"v": version})
+                last_id, done = conn.execute(text("SELECT last_id, done FROM schema_backfills WHERE version = :v"),
+                                             {"v": version}).one()
+                if done:
+                    break
+                next_id = module.backfill(conn, last_id, batch_size)
+                conn.execute(text("UPDATE schema_backfills SET last_id = :l, done = :d, updated_at = :t WHERE version = :v"),
+                             {"l": last_id if next_id is None else next_id, "d": next_id is None,
+                              "t": datetime.utcnow(), "v": version})
+            batches += 1
+            if next_id is None:
+                print(f"Backfill {version:04d}_{name} complete")
+                break
+            print(f"Backfill {version:04d}_{name}: processed up to id {next_id}")
+            if pause_seconds and stop is not None:
+                stop.wait(pause_seconds)
+    return batches
+
+
+def status(db_engine=engine):
+    with db_engine.begin() as conn:
+        done = _bookkeeping(conn)
+        backfills = {version: (last_id, finished) for version, last_id, finished in
+                     conn.execute(text("SELECT version, last_id, done FROM schema_backfills")).all()}
+    for version, name, module in discover():
+        state = "applied" if version in done else "pending"
+        if version in backfills:
+            last_id, finished = backfills[version]
+            state += ", backfill done" if finished else f", backfill at id {last_id}"
+        print(f"{version:04d}_{name}: {state}")
+
+
+class BackgroundBackfills:
+    """Runs pending backfills on a thread after startup; stop() lets the current batch finish"""
+
+    def __init__(self, batch_size: int = MIGRATION_BATCH_SIZE, pause_ms: float = MIGRATION_BATCH_PAUSE_MS):
+        self.batch_size = batch_size
+        self.pause = pause_ms / 1000
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="schema-backfills", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        try:
+            run_backfills(batch_size=self.batch_size, stop=self._stop, pause_seconds=self.pause)
+        except Exception as e:
+            print(f"Schema backfill stopped, resuming on next start: {e}")
+
+
+schema_backfills = BackgroundBackfills()
+
 
 if __name__ == "__main__":
-    migrate_database()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--status", action="store_true", help="list migrations and backfill progress")
+    parser.add_argument("--batch-size", type=int, default=MIGRATION_BATCH_SIZE, help="rows per backfill transaction")
+    args = parser.parse_args()
+    if args.status:
+        status()
+    else:
+        upgrade_schema()
+        run_backfills(batch_size=args.batch_size)
+        print("Database migration completed successfully!")
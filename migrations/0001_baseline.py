@@ -0,0 +1,48 @@
+"""The schema as it stood before versioned migrations: users, chats and summaries.
+
+The tables are defined here rather than taken from database.py, so the
+baseline stays fixed as the models evolve. Existing tables are left as they
+are: databases created before the profile fields existed are brought up to
+date by 0002.
+"""
+
+from sqlalchemy import JSON, Boolean, Column, DateTime, Integer, MetaData, String, Table, Text
+
+metadata = MetaData()
+
+Table(
+    "users", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("username", String, unique=True, index=True),
+    Column("email", String, unique=True, index=True),
+    Column("full_name", String),
+    Column("age", Integer),
+    Column("gender", String),
+    Column("password_hash", String),
+    Column("created_at", DateTime),
+    Column("assessment_data", JSON),
+)
+
+Table(
+    "chats", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("user_id", Integer, index=True),
+    Column("bot", String),
+    Column("message", Text),
+    Column("reply", Text),
+    Column("timestamp", DateTime),
+    Column("via_call", Boolean),
+)
+
+Table(
+    "summaries", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("user_id", Integer, index=True),
+    Column("bot", String),
+    Column("summary_text", Text),
+    Column("created_at", DateTime),
+)
+
+
+def upgrade(conn):
+    metadata.create_all(bind=conn)
@@ -0,0 +1,29 @@
+"""Email, name, age and gender on users; accounts that predate emails get email = username"""
+
+from sqlalchemy import bindparam, inspect, text
+
+PROFILE_COLUMNS = [("email", "VARCHAR"), ("full_name", "VARCHAR"), ("age", "INTEGER"), ("gender", "VARCHAR")]
+
+
+def upgrade(conn):
+    columns = {column["name"] for column in inspect(conn).get_columns("users")}
+    for name, sql_type in PROFILE_COLUMNS:
+        if name not in columns:
+            conn.execute(text(f"ALTER TABLE users ADD COLUMN {name} {sql_type}"))
+    indexes = inspect(conn).get_indexes("users")
+    if not any(index["unique"] and index["column_names"] == ["email"] for index in indexes):
+        conn.execute(text("CREATE UNIQUE INDEX idx_users_email ON users (email)"))
+
+
+def backfill(conn, after_id: int, batch_size: int):
+    ids = conn.execute(
+        text("SELECT id FROM users WHERE id > :after AND email IS NULL ORDER BY id LIMIT :n"),
+        {"after": after_id, "n": batch_size}
+    ).scalars().all()
+    if not ids:
+        return None
+    conn.execute(
+        text("UPDATE users SET email = username WHERE id IN :ids").bindparams(bindparam("ids", expanding=True)),
+        {"ids": ids}
+    )
+    return ids[-1]
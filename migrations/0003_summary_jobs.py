@@ -0,0 +1,19 @@
+"""summary_jobs: pending auto-summaries, so queued work survives a restart"""
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, UniqueConstraint
+
+metadata = MetaData()
+
+Table(
+    "summary_jobs", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("user_id", Integer),
+    Column("bot", String),
+    Column("attempts", Integer),
+    Column("created_at", DateTime),
+    UniqueConstraint("user_id", "bot", name="uq_summary_jobs_user_bot"),
+)
+
+
+def upgrade(conn):
+    metadata.create_all(bind=conn)
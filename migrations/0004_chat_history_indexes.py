@@ -0,0 +1,36 @@
+"""Composite indexes for the history queries, and chat_counters recounted from existing chats"""
+
+from sqlalchemy import Column, Integer, MetaData, String, Table, text
+
+metadata = MetaData()
+
+Table(
+    "chat_counters", metadata,
+    Column("user_id", Integer, primary_key=True),
+    Column("bot", String, primary_key=True),
+    Column("message_count", Integer, nullable=False),
+)
+
+
+def upgrade(conn):
+    metadata.create_all(bind=conn)
+    conn.execute(text("CREATE INDEX ix_chats_user_bot_timestamp ON chats (user_id, bot, timestamp)"))
+    conn.execute(text("CREATE INDEX ix_summaries_user_bot_created_at ON summaries (user_id, bot, created_at)"))
+
+
+def backfill(conn, after_id: int, batch_size: int):
+    """Recount a batch of users (after_id is a user id here)"""
+    user_ids = conn.execute(
+        text("SELECT DISTINCT user_id FROM chats WHERE user_id > :after ORDER BY user_id LIMIT :n"),
+        {"after": after_id, "n": batch_size}
+    ).scalars().all()
+    if not user_ids:
+        return None
+    window = {"low": after_id, "high": user_ids[-1]}
+    conn.execute(text("DELETE FROM chat_counters WHERE user_id > :low AND user_id <= :high"), window)
+    conn.execute(text("""
+        INSERT INTO chat_counters (user_id, bot, message_count)
+        SELECT user_id, bot, COUNT(*) FROM chats
+        WHERE user_id > :low AND user_id <= :high GROUP BY user_id, bot
+    """), window)
+    return user_ids[-1]
@@ -0,0 +1,80 @@
+"""Full-text search index over chats (SQLite FTS5), with triggers and a batched backfill of existing chats.
+
+"owner" (bot || user_id, e.g. "aarav42") is an indexed column so a search only
+scores that conversation's rows. Keeping Mc/Mn in the token categories holds
+Devanagari words together instead of splitting them at matras. The nukta
+(U+093C) is stripped from indexed text, so "ज़िंदगी" and the more commonly typed
+"जिंदगी" index alike. The view and all three triggers must strip it the same
+way, or external-content deletes won't match. Rows with ids in
+(last_id, until_id] of chat_search_backfill predate the index; the triggers
+leave them alone until backfill() has indexed them.
+"""
+
+from sqlalchemy import text
+
+CHAT_SEARCH_DDL = [
+    """CREATE TABLE IF NOT EXISTS chat_search_backfill (
+        last_id INTEGER NOT NULL,
+        until_id INTEGER NOT NULL
+    )""",
+    "DELETE FROM chat_search_backfill",
+    "INSERT INTO chat_search_backfill (last_id, until_id) SELECT 0, COALESCE(MAX(id), 0) FROM chats",
+    """CREATE VIEW IF NOT EXISTS chat_search_source AS
+        SELECT id, replace(message, char(2364), '') AS message, replace(reply, char(2364), '') AS reply,
+               bot || user_id AS owner
+        FROM chats""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS chats_fts USING fts5(
+        message, reply, owner,
+        content='chat_search_source', content_rowid='id',
+        tokenize="unicode61 remove_diacritics 2 categories 'L* N* Co Mc Mn'"
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS chats_fts_ai AFTER INSERT ON chats
+        WHEN new.id <= (SELECT last_id FROM chat_search_backfill) OR new.id > (SELECT until_id FROM chat_search_backfill)
+        BEGIN
+            INSERT INTO chats_fts (rowid, message, reply, owner)
+            VALUES (new.id, replace(new.message, char(2364), ''), replace(new.reply, char(2364), ''), new.bot || new.user_id);
+        END""",
+    """CREATE TRIGGER IF NOT EXISTS chats_fts_ad AFTER DELETE ON chats
+        WHEN old.id <= (SELECT last_id FROM chat_search_backfill) OR old.id > (SELECT until_id FROM chat_search_backfill)
+        BEGIN
+            INSERT INTO chats_fts (chats_fts, rowid, message, reply, owner)
+            VALUES ('delete', old.id, replace(old.message, char(2364), ''), replace(old.reply, char(2364), ''), old.bot || old.user_id);
+        END""",
+    """CREATE TRIGGER IF NOT EXISTS chats_fts_au AFTER UPDATE OF message, reply, bot, user_id ON chats
+        WHEN old.id <= (SELECT last_id FROM chat_search_backfill) OR old.id > (SELECT until_id FROM chat_search_backfill)
+        BEGIN
+            INSERT INTO chats_fts (chats_fts, rowid, message, reply, owner)
+            VALUES ('delete', old.id, replace(old.message, char(2364), ''), replace(old.reply, char(2364), ''), old.bot || old.user_id);
+            INSERT INTO chats_fts (rowid, message, reply, owner)
+            VALUES (new.id, replace(new.message, char(2364), ''), replace(new.reply, char(2364), ''), new.bot || new.user_id);
+        END""",
+]
+
+
+def upgrade(conn):
+    if conn.dialect.name != "sqlite":
+        return  # chat_search falls back to ILIKE elsewhere
+    # Existing chats are marked pending in the same transaction that installs the triggers
+    for statement in CHAT_SEARCH_DDL:
+        conn.exec_driver_sql(statement)
+
+
+def backfill(conn, after_id: int, batch_size: int):
+    """Index the next batch of pre-existing chats; progress is kept in chat_search_backfill for the triggers"""
+    if conn.dialect.name != "sqlite":
+        return None
+    last_id, until_id = conn.execute(text("SELECT last_id, until_id FROM chat_search_backfill")).one()
+    if last_id >= until_id:
+        return None
+    window = {"last": last_id, "until": until_id, "n": batch_size}
+    conn.execute(text("""
+        INSERT INTO chats_fts (rowid, message, reply, owner)
+        SELECT id, message, reply, owner FROM chat_search_source
+        WHERE id > :last AND id <= :until ORDER BY id LIMIT :n
+    """), window)
+    batch_last = conn.execute(text(
+        "SELECT MAX(id) FROM (SELECT id FROM chats WHERE id > :last AND id <= :until ORDER BY id LIMIT :n)"
+    ), window).scalar()
+    last_id = until_id if batch_last is None else batch_last
+    conn.execute(text("UPDATE chat_search_backfill SET last_id = :last"), {"last": last_id})
+    return last_id
@@ -0,0 +1,27 @@
+"""chat_archives: compressed blocks of old chat turns (see chat_archive.py)"""
+
+from sqlalchemy import Column, DateTime, Index, Integer, LargeBinary, MetaData, String, Table
+
+metadata = MetaData()
+
+Table(
+    "chat_archives", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("user_id", Integer, nullable=False),
+    Column("bot", String, nullable=False),
+    Column("first_chat_id", Integer, nullable=False),
+    Column("first_timestamp", DateTime, nullable=False),
+    Column("last_chat_id", Integer, nullable=False),
+    Column("last_timestamp", DateTime, nullable=False),
+    Column("row_count", Integer, nullable=False),
+    Column("codec", String, nullable=False),
+    Column("data", LargeBinary, nullable=False),
+    Column("created_at", DateTime),
+    Index("ix_chat_archives_user_bot_last", "user_id", "bot", "last_timestamp", "last_chat_id"),
+    # Block ids are never reused after a delete; decoded blocks are cached by id
+    sqlite_autoincrement=True,
+)
+
+
+def upgrade(conn):
+    metadata.create_all(bind=conn)
@@ -0,0 +1,44 @@
+"""summaries.embedding for the memory index, computed for existing summaries in batches"""
+
+import re
+import zlib
+from array import array
+from collections import Counter
+
+from sqlalchemy import LargeBinary, text
+
+# Frozen copy of memory_index.encode_embedding as of this migration, so what it
+# backfills never changes with the live encoder (and the app isn't imported)
+_DIM = 2048
+_WORD_RE = re.compile(r"[\w\u0900-\u0963\u0966-\u097f]+")
+_NORMALIZE = str.maketrans({"'": None, "\u2019": None, "\u093c": None})
+
+
+def encode_embedding(summary_text: str) -> bytes:
+    counts = Counter()
+    for word in _WORD_RE.findall(summary_text.lower().translate(_NORMALIZE)):
+        counts[zlib.crc32(word.encode()) % _DIM] += 1
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            counts[zlib.crc32(padded[i:i + 3].encode()) % _DIM] += 1
+    buckets = sorted(counts)
+    return array("H", buckets).tobytes() + array("H", (min(counts[b], 65535) for b in buckets)).tobytes()
+
+
+def upgrade(conn):
+    # Nullable ADD COLUMN only touches the schema, not the rows
+    conn.execute(text(f"ALTER TABLE summaries ADD COLUMN embedding {LargeBinary().compile(dialect=conn.dialect)}"))
+
+
+def backfill(conn, after_id: int, batch_size: int):
+    rows = conn.execute(
+        text("SELECT id, summary_text FROM summaries WHERE id > :after AND embedding IS NULL ORDER BY id LIMIT :n"),
+        {"after": after_id, "n": batch_size}
+    ).all()
+    if not rows:
+        return None
+    conn.execute(
+        text("UPDATE summaries SET embedding = :embedding WHERE id = :id"),
+        [{"id": summary_id, "embedding": encode_embedding(summary_text or "")} for summary_id, summary_text in rows]
+    )
+    return rows[-1].id
@@ -0,0 +1,8 @@
+"""chat_counters.generation: bumped on summaries and deletes so every worker's caches can tell a conversation changed"""
+
+from sqlalchemy import text
+
+
+def upgrade(conn):
+    # A constant default fills existing rows without rewriting them
+    conn.execute(text("ALTER TABLE chat_counters ADD COLUMN generation INTEGER NOT NULL DEFAULT 0"))
@@ -0,0 +1,8 @@
+"""summary_jobs.claimed_by / claimed_at: a lease so each persisted job runs in one worker process"""
+
+from sqlalchemy import DateTime, String, text
+
+
+def upgrade(conn):
+    conn.execute(text(f"ALTER TABLE summary_jobs ADD COLUMN claimed_by {String().compile(dialect=conn.dialect)}"))
+    conn.execute(text(f"ALTER TABLE summary_jobs ADD COLUMN claimed_at {DateTime().compile(dialect=conn.dialect)}"))
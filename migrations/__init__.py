@@ -0,0 +1,16 @@
+"""
+Ordered schema migrations, applied by migrate_db.py.
+
+Each NNNN_name.py defines upgrade(conn), run inside one transaction on a
+SQLAlchemy connection, and optionally backfill(conn, after_id, batch_size),
+which processes one batch of rows after `after_id` and returns the last id
+it handled, or None once nothing is left. Keep upgrade() to fast schema
+changes (new tables, nullable ADD COLUMN, indexes) and move data rewrites
+into backfill() so no transaction holds the write lock for long.
+
+Migrations describe their tables themselves instead of importing the models,
+so a fresh database replays the same history an upgraded one went through.
+Never edit a shipped migration; add a new one. 0001 and 0002 adopt databases
+created before versioning and check what already exists; later migrations
+can rely on the schema the earlier ones leave behind.
+"""
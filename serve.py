@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Production launcher: a preloading master process and N forked uvicorn workers.
+
+The master imports the app and runs prepare() (schema upgrades, asset build)
+once, binds the listening socket, then forks WEB_WORKERS workers that accept
+on it. Database pools, the LLM client and background jobs are created in each
+worker by the app's lifespan, never inherited across the fork. Workers that
+die are replaced. In-process caches check a version kept in the database, so
+workers see each other's writes; write-behind chat buffers cannot be shared,
+so CHAT_WRITE_BEHIND=1 requires a single worker.
+
+SIGTERM or SIGINT drains: workers answer /readyz with 503 for DRAIN_SECONDS so
+load balancers stop routing to them, then stop accepting, finish in-flight
+requests (cancelling after GRACEFUL_TIMEOUT_SECONDS) and run the lifespan
+shutdown. A second signal skips the drain wait.
+
+    python serve.py --workers 4 --port 8000
+"""
+
+import argparse
+import os
+import signal
+import socket
+import threading
+import time
+
+import uvicorn
+
+from app import app, prepare
+from chat_writer import CHAT_WRITE_BEHIND
+from database import engine
+
+# Launcher settings (overridable via environment)
+WEB_WORKERS = int(os.environ.get("WEB_WORKERS", os.cpu_count() or 1))
+HOST = os.environ.get("HOST", "0.0.0.0")
+PORT = int(os.environ.get("PORT", 8000))
+DRAIN_SECONDS = float(os.environ.get("DRAIN_SECONDS", 5))
+GRACEFUL_TIMEOUT_SECONDS = int(os.environ.get("GRACEFUL_TIMEOUT_SECONDS", 30))
+LISTEN_BACKLOG = int(os.environ.get("LISTEN_BACKLOG", 2048))
+
+# A worker that exits sooner than this after starting is restarted with a delay, not in a tight loop
+MIN_WORKER_UPTIME_SECONDS = 1.0
+
+
+class DrainingServer(uvicorn.Server):
+    """uvicorn server that fails readiness for drain_seconds before shutting down"""
+
+    def __init__(self, config: uvicorn.Config, drain_seconds: float = DRAIN_SECONDS, forked: bool = False):
+        super().__init__(config)
+        self.drain_seconds = drain_seconds
+        self.master_pid = os.getppid() if forked else None
+        self._draining = False
+
+    def handle_exit(self, sig, frame):
+        if self._draining or not self.drain_seconds:
+            return super().handle_exit(sig, frame)
+        self._draining = True
+        app.state.draining = True
+        timer = threading.Timer(self.drain_seconds, self._stop_accepting)
+        timer.daemon = True
+        timer.start()
+
+    def _stop_accepting(self):
+        if not self.should_exit:
+            self.should_exit = True
+
+    async def on_tick(self, counter: int) -> bool:
+        # Workers run in their own process group (see spawn), so drain if the master disappears
+        if self.master_pid and counter % 10 == 0 and not self._draining and os.getppid() != self.master_pid:
+            self.handle_exit(signal.SIGTERM, None)
+        return await super().on_tick(counter)
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(LISTEN_BACKLOG)
+    sock.set_inheritable(True)
+    return sock
+
+
+def make_server(args, forked: bool = False) -> DrainingServer:
+    config = uvicorn.Config(
+        app, lifespan="on", timeout_graceful_shutdown=args.graceful_timeout,
+        backlog=LISTEN_BACKLOG, proxy_headers=True, access_log=args.access_log
+    )
+    return DrainingServer(config, args.drain, forked)
+
+
+def spawn(sock: socket.socket, args) -> int:
+    pid = os.fork()
+    if pid:
+        return pid
+    # Own process group: a terminal Ctrl-C reaches only the master, which forwards it once
+    os.setpgid(0, 0)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    status = 0
+    try:
+        make_server(args, forked=True).run(sockets=[sock])
+    except BaseException as e:
+        print(f"Worker {os.getpid()} crashed: {e}")
+        status = 1
+    finally:
+        os._exit(status)
+
+
+def supervise(sock: socket.socket, args):
+    workers = {}
+    stopping = []
+
+    def forward(sig, frame):
+        stopping.append(sig)
+        for pid in workers:
+            try:
+                os.kill(pid, sig)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+
+    for _ in range(args.workers):
+        workers[spawn(sock, args)] = time.monotonic()
+    print(f"Serving on {args.host}:{args.port} with {args.workers} workers (master pid {os.getpid()})")
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = workers.pop(pid, None)
+        if started is None or stopping:
+            continue
+        reason = f"status {os.WEXITSTATUS(status)}" if os.WIFEXITED(status) else f"signal {os.WTERMSIG(status)}"
+        print(f"Worker {pid} exited with {reason}, restarting")
+        if time.monotonic() - started < MIN_WORKER_UPTIME_SECONDS:
+            time.sleep(MIN_WORKER_UPTIME_SECONDS)
+        if not stopping:
+            workers[spawn(sock, args)] = time.monotonic()
+    sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=WEB_WORKERS)
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--drain", type=float, default=DRAIN_SECONDS, help="seconds /readyz fails before shutdown")
+    parser.add_argument("--graceful-timeout", type=int, default=GRACEFUL_TIMEOUT_SECONDS)
+    parser.add_argument("--access-log", action="store_true")
+    args = parser.parse_args()
+    if args.workers > 1 and CHAT_WRITE_BEHIND:
+        # Buffered turns live in one worker until flushed; the others would build prompts without them
+        parser.error("CHAT_WRITE_BEHIND=1 needs --workers 1 (or WEB_WORKERS=1): buffered chats are only visible to their own worker")
+
+    # Shared one-off work happens once here; the forked workers find it done
+    prepare()
+    engine.dispose()
+    sock = bind_socket(args.host, args.port)
+
+    if args.workers <= 1 or not hasattr(os, "fork"):
+        make_server(args).run(sockets=[sock])
+        return
+    supervise(sock, args)
+
+
+if __name__ == "__main__":
+    main()
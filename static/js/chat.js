@@ -4,17 +4,31 @@ let isInCall = false;
 let recognition = null;
 let synthesis = window.speechSynthesis;
 
+// History paging state (newest page loads first, older pages on scroll-up)
+let historyCursor = null;
+let isLoadingHistory = false;
+
+// WebSocket chat channel (falls back to HTTP streaming while disconnected)
+const HEARTBEAT_INTERVAL_MS = 25000;
+const PONG_TIMEOUT_MS = 10000;
+const MAX_RECONNECT_DELAY_MS = 30000;
+let chatSocket = null;
+let socketBot = null;
+let heartbeatTimer = null;
+let pongTimer = null;
+let reconnectTimer = null;
+let reconnectDelay = 1000;
+let pendingReply = null;
+
 const botInfo = {
     aarav: {
         name: 'Aarav',
         description: 'Calm & Logical Support',
-        avatar: '/static/images/aarav.png',
         accent: '#00d4aa'
     },
     meera: {
         name: 'Meera', 
         description: 'Warm & Empathetic Support',
-        avatar: '/static/images/meera.png',
         accent: '#667eea'
     }
 };
@@ -23,6 +37,7 @@ document.addEventListener('DOMContentLoaded', function() {
     initializeChat();
     setupEventListeners();
     loadChatHistory();
+    connectChatSocket();
 });
 
 function initializeChat() {
@@ -95,6 +110,13 @@ function setupEventListeners() {
         }
     });
     
+    // Lazy-load older history when scrolled near the top
+    document.getElementById('chat-messages').addEventListener('scroll', function() {
+        if (this.scrollTop < 50) {
+            loadOlderMessages();
+        }
+    });
+    
     // Voice recognition button
     document.getElementById('voice-btn').addEventListener('click', openVoiceModal);
     
@@ -148,20 +170,148 @@ function switchBot(botName) {
     
     // Update current bot info
     const bot = botInfo[botName];
-    document.getElementById('current-bot-avatar').src = bot.avatar;
+    // Reuse the tab's avatar so the fingerprinted URL comes from the template
+    document.getElementById('current-bot-avatar').src = document.querySelector(`[data-bot="${botName}"] .bot-avatar`).src;
     document.getElementById('current-bot-name').textContent = bot.name;
     document.getElementById('current-bot-desc').textContent = bot.description;
     
     // Load chat history for this bot
     loadChatHistory();
+    connectChatSocket();
+}
+
+function connectChatSocket() {
+    clearTimeout(reconnectTimer);
+    if (chatSocket) {
+        // Detach handlers so the old socket's close doesn't trigger a reconnect
+        chatSocket.onclose = null;
+        chatSocket.close();
+        stopHeartbeat();
+    }
+    if (pendingReply) {
+        pendingReply.reject(new Error('Switched conversation'));
+        pendingReply = null;
+    }
+    
+    const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+    const bot = currentBot;
+    const socket = new WebSocket(`${protocol}//${window.location.host}/ws/chat/${bot}`);
+    chatSocket = socket;
+    socketBot = bot;
+    
+    socket.onopen = function() {
+        reconnectDelay = 1000;
+        startHeartbeat();
+    };
+    
+    socket.onmessage = function(event) {
+        handleSocketMessage(JSON.parse(event.data));
+    };
+    
+    socket.onclose = function(event) {
+        stopHeartbeat();
+        if (pendingReply) {
+            pendingReply.reject(new Error('Connection lost'));
+            pendingReply = null;
+        }
+        // 4401: not logged in, 4400: unknown bot; reconnecting won't help either
+        if (event.code === 4401 || event.code === 4400) return;
+        reconnectTimer = setTimeout(connectChatSocket, reconnectDelay);
+        reconnectDelay = Math.min(reconnectDelay * 2, MAX_RECONNECT_DELAY_MS);
+    };
+}
+
+function startHeartbeat() {
+    stopHeartbeat();
+    heartbeatTimer = setInterval(function() {
+        // The server doesn't read the socket while it streams a reply, so a ping
+        // would go unanswered until the reply ends; the reply's frames show liveness
+        if (chatSocket.readyState !== WebSocket.OPEN || pendingReply) return;
+        chatSocket.send(JSON.stringify({ type: 'ping' }));
+        // No pong in time: assume the connection is dead and reconnect
+        pongTimer = setTimeout(function() {
+            chatSocket.close();
+        }, PONG_TIMEOUT_MS);
+    }, HEARTBEAT_INTERVAL_MS);
+}
+
+function stopHeartbeat() {
+    clearInterval(heartbeatTimer);
+    clearTimeout(pongTimer);
+}
+
+function handleSocketMessage(data) {
+    // Any frame proves the connection is alive
+    clearTimeout(pongTimer);
+    if (data.type === 'pong') return;
+    if (!pendingReply) return;
+    
+    if (data.type === 'delta') {
+        pendingReply.onDelta(data.delta);
+    } else if (data.type === 'done') {
+        pendingReply.resolve(data.reply);
+        pendingReply = null;
+    } else if (data.type === 'error') {
+        pendingReply.reject(new Error(data.detail));
+        pendingReply = null;
+    }
+}
+
+function socketReady() {
+    return chatSocket && chatSocket.readyState === WebSocket.OPEN && socketBot === currentBot && !pendingReply;
+}
+
+// Send over the socket, rendering deltas into the bot bubble as they arrive
+function sendOverSocket(message, typingDiv) {
+    const renderer = createReplyRenderer(typingDiv);
+    return new Promise(function(resolve, reject) {
+        pendingReply = {
+            onDelta: renderer.append,
+            resolve: function(reply) { resolve(renderer.finish(reply)); },
+            reject: reject
+        };
+        // A ping already in flight is answered only after this reply; don't time it out meanwhile
+        clearTimeout(pongTimer);
+        chatSocket.send(JSON.stringify({ message: message, via_call: isInCall }));
+    });
+}
+
+// Swaps the typing indicator for a bot bubble on the first token
+function createReplyRenderer(typingDiv) {
+    const messagesContainer = document.getElementById('chat-messages');
+    let botDiv = null;
+    let reply = '';
+    
+    return {
+        append: function(delta) {
+            if (!botDiv) {
+                typingDiv.remove();
+                botDiv = document.createElement('div');
+                botDiv.className = 'message bot';
+                messagesContainer.appendChild(botDiv);
+            }
+            reply += delta;
+            botDiv.textContent = reply;
+            messagesContainer.scrollTop = messagesContainer.scrollHeight;
+        },
+        finish: function(finalReply) {
+            if (!botDiv) {
+                typingDiv.remove();
+                addMessageToChat(finalReply, 'bot');
+            }
+            return finalReply;
+        }
+    };
 }
 
 async function loadChatHistory() {
+    historyCursor = null;
     try {
         const response = await fetch(`/api/chats/${currentBot}`);
         if (response.ok) {
-            const chats = await response.json();
-            displayChatHistory(chats);
+            const page = await response.json();
+            historyCursor = page.next_cursor;
+            displayChatHistory(page.chats);
         }
     } catch (error) {
         console.error('Error loading chat history:', error);
@@ -181,7 +331,8 @@ function displayChatHistory(chats) {
         return;
     }
     
-    chats.forEach(chat => {
+    // Pages arrive newest first; render oldest at the top
+    chats.slice().reverse().forEach(chat => {
         addMessageToChat(chat.message, 'user');
         addMessageToChat(chat.reply, 'bot');
     });
@@ -189,6 +340,45 @@ function displayChatHistory(chats) {
     messagesContainer.scrollTop = messagesContainer.scrollHeight;
 }
 
+async function loadOlderMessages() {
+    if (!historyCursor || isLoadingHistory) return;
+    
+    isLoadingHistory = true;
+    const bot = currentBot;
+    try {
+        const response = await fetch(`/api/chats/${bot}?before=${historyCursor}`);
+        // Ignore pages that finish loading after the user switched bots
+        if (response.ok && bot === currentBot) {
+            const page = await response.json();
+            historyCursor = page.next_cursor;
+            prependChatHistory(page.chats);
+        }
+    } catch (error) {
+        console.error('Error loading older messages:', error);
+    } finally {
+        isLoadingHistory = false;
+    }
+}
+
+function prependChatHistory(chats) {
+    const messagesContainer = document.getElementById('chat-messages');
+    const fragment = document.createDocumentFragment();
+    
+    chats.slice().reverse().forEach(chat => {
+        [[chat.message, 'user'], [chat.reply, 'bot']].forEach(([text, sender]) => {
+            const messageDiv = document.createElement('div');
+            messageDiv.className = `message ${sender}`;
+            messageDiv.textContent = text;
+            fragment.appendChild(messageDiv);
+        });
+    });
+    
+    // Keep the viewport anchored on the message the user was looking at
+    const previousHeight = messagesContainer.scrollHeight;
+    messagesContainer.insertBefore(fragment, messagesContainer.firstChild);
+    messagesContainer.scrollTop += messagesContainer.scrollHeight - previousHeight;
+}
+
 function addMessageToChat(message, sender) {
     const messagesContainer = document.getElementById('chat-messages');
     const messageDiv = document.createElement('div');
@@ -221,6 +411,19 @@ async function sendMessage() {
     typingDiv.innerHTML = '<div class="typing-dots"><span></span><span></span><span></span></div>';
     document.getElementById('chat-messages').appendChild(typingDiv);
     
+    if (socketReady()) {
+        try {
+            const reply = await sendOverSocket(message, typingDiv);
+            if (isInCall) {
+                speakText(reply);
+            }
+        } catch (error) {
+            console.error('Error sending message:', error);
+            typingDiv.textContent = 'Sorry, I encountered an error. Please try again.';
+        }
+        return;
+    }
+    
     try {
         const response = await fetch(`/chat/${currentBot}`, {
             method: 'POST',
@@ -229,22 +432,17 @@ async function sendMessage() {
             },
             body: JSON.stringify({ 
                 message: message,
-                via_call: isInCall 
+                via_call: isInCall,
+                stream: true
             })
         });
         
         if (response.ok) {
-            const data = await response.json();
-            
-            // Remove typing indicator
-            typingDiv.remove();
-            
-            // Add bot response
-            addMessageToChat(data.reply, 'bot');
+            const reply = await readStreamedReply(response, typingDiv);
             
             // If in call, speak the response
             if (isInCall) {
-                speakText(data.reply);
+                speakText(reply);
             }
         } else {
             typingDiv.textContent = 'Sorry, I encountered an error. Please try again.';
@@ -255,6 +453,50 @@ async function sendMessage() {
     }
 }
 
+// Render Server-Sent Event deltas into the bot bubble as they arrive
+async function readStreamedReply(response, typingDiv) {
+    const renderer = createReplyRenderer(typingDiv);
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let reply = '';
+    
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        
+        // Events are separated by a blank line
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            
+            let eventType = 'message';
+            let data = '';
+            rawEvent.split('\n').forEach(line => {
+                if (line.startsWith('event:')) eventType = line.slice(6).trim();
+                else if (line.startsWith('data:')) data += line.slice(5).trim();
+            });
+            if (!data) continue;
+            const payload = JSON.parse(data);
+            
+            if (eventType === 'error') {
+                throw new Error(payload.detail);
+            }
+            if (payload.delta) {
+                reply += payload.delta;
+                renderer.append(payload.delta);
+            }
+            if (payload.done) {
+                reply = payload.reply;
+            }
+        }
+    }
+    
+    return renderer.finish(reply);
+}
+
 // Voice Recognition Functions
 function openVoiceModal() {
     const modal = document.getElementById('voice-modal');
@@ -0,0 +1,145 @@
+import gzip
+import hashlib
+import io
+import json
+import mimetypes
+import os
+import tempfile
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+try:
+    import brotli
+except ImportError:  # brotli variants are optional; gzip is always built
+    brotli = None
+
+try:
+    from PIL import Image
+except ImportError:  # WebP re-encoding is optional
+    Image = None
+
+# Asset pipeline settings (overridable via environment)
+STATIC_SOURCE_DIR = os.environ.get("STATIC_SOURCE_DIR", "static")
+STATIC_BUILD_DIR = os.environ.get("STATIC_BUILD_DIR", "static_build")
+STATIC_WEBP = os.environ.get("STATIC_WEBP", "1") == "1"
+STATIC_WEBP_QUALITY = int(os.environ.get("STATIC_WEBP_QUALITY", 85))
+ASSETS_URL_PREFIX = "/assets"
+
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".svg", ".html", ".json", ".txt"}
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def _write_atomic(path: str, data: bytes):
+    # Workers may build concurrently; readers only ever see complete files
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _encode_webp(source_path: str) -> bytes:
+    with Image.open(source_path) as image:
+        buffer = io.BytesIO()
+        image.save(buffer, "WEBP", quality=STATIC_WEBP_QUALITY, method=6)
+        return buffer.getvalue()
+
+
+def build_assets(source_dir: str = STATIC_SOURCE_DIR, build_dir: str = STATIC_BUILD_DIR) -> dict:
+    """Fingerprint every file under source_dir into build_dir with precompressed variants.
+
+    Returns and saves the manifest mapping logical paths ("css/style.css") to
+    hashed ones ("css/style.3f2a9c1b7d4e.css"). Outputs are content-addressed,
+    so unchanged assets are skipped on the next build.
+    """
+    manifest = {}
+    for root, _, files in os.walk(source_dir):
+        for name in sorted(files):
+            source_path = os.path.join(root, name)
+            logical = os.path.relpath(source_path, source_dir).replace(os.sep, "/")
+            with open(source_path, "rb") as f:
+                data = f.read()
+            stem, ext = os.path.splitext(logical)
+            hashed = f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+            manifest[logical] = hashed
+
+            target = os.path.join(build_dir, hashed)
+            if os.path.exists(target):
+                continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            if ext in COMPRESSIBLE_EXTENSIONS:
+                _write_atomic(target + ".gz", gzip.compress(data, compresslevel=9, mtime=0))
+                if brotli is not None:
+                    _write_atomic(target + ".br", brotli.compress(data, quality=11))
+            if ext == ".png" and STATIC_WEBP and Image is not None:
+                webp = _encode_webp(source_path)
+                if len(webp) < len(data):
+                    _write_atomic(os.path.splitext(target)[0] + ".webp", webp)
+            # The plain file goes last: its presence marks the asset as fully built
+            _write_atomic(target, data)
+
+    os.makedirs(build_dir, exist_ok=True)
+    _write_atomic(os.path.join(build_dir, "manifest.json"), json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return manifest
+
+
+class AssetManifest:
+    """Logical asset path -> fingerprinted URL, falling back to the plain /static URL"""
+
+    def __init__(self):
+        self._entries = {}
+
+    def load(self, manifest: dict):
+        self._entries = dict(manifest)
+
+    def url(self, path: str) -> str:
+        hashed = self._entries.get(path)
+        if hashed is None:
+            return f"/static/{path}"
+        return f"{ASSETS_URL_PREFIX}/{hashed}"
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """Serves fingerprinted assets forever-cacheable, picking br/gzip/WebP variants by request headers"""
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        request_headers = Headers(scope=scope)
+        full_path = str(full_path)
+        media_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+        headers = {"Cache-Control": IMMUTABLE_CACHE_CONTROL}
+        served_path = full_path
+
+        root, ext = os.path.splitext(full_path)
+        if ext in COMPRESSIBLE_EXTENSIONS:
+            headers["Vary"] = "Accept-Encoding"
+            accepted = request_headers.get("accept-encoding", "")
+            for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+                if encoding in accepted and os.path.exists(full_path + suffix):
+                    served_path = full_path + suffix
+                    headers["Content-Encoding"] = encoding
+                    break
+        elif ext == ".png":
+            headers["Vary"] = "Accept"
+            if "image/webp" in request_headers.get("accept", "") and os.path.exists(root + ".webp"):
+                served_path = root + ".webp"
+                media_type = "image/webp"
+
+        if served_path != full_path:
+            stat_result = os.stat(served_path)
+        response = FileResponse(
+            served_path, status_code=status_code, stat_result=stat_result,
+            method=scope["method"], media_type=media_type, headers=headers
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+asset_manifest = AssetManifest()
+
+
+if __name__ == "__main__":
+    built = build_assets()
+    print(f"Built {len(built)} assets into {STATIC_BUILD_DIR}/"
+          f" (brotli {'on' if brotli else 'off'}, webp {'on' if STATIC_WEBP and Image else 'off'})")
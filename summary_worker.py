@@ -0,0 +1,215 @@
+import asyncio
+import os
+import random
+import socket
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, delete, update, or_
+from sqlalchemy.exc import IntegrityError
+
+from database import AsyncSessionLocal, Chat, Summary, SummaryJob
+from llm_client import summarize_conversation, llm_gateway
+from context_cache import bump_generation, context_cache
+from memory_index import encode_embedding, memory_index
+from instrumentation import timed
+
+# Worker settings (overridable via environment)
+SUMMARY_WORKERS = int(os.environ.get("SUMMARY_WORKERS", 2))
+SUMMARY_MAX_ATTEMPTS = int(os.environ.get("SUMMARY_MAX_ATTEMPTS", 4))
+SUMMARY_RETRY_BASE_SECONDS = float(os.environ.get("SUMMARY_RETRY_BASE_SECONDS", 2))
+SUMMARY_PERSIST_JOBS = os.environ.get("SUMMARY_PERSIST_JOBS", "1") == "1"
+# A persisted job claimed longer ago than this is presumed abandoned (its worker died) and re-run
+SUMMARY_LEASE_SECONDS = float(os.environ.get("SUMMARY_LEASE_SECONDS", 300))
+
+# Number of recent messages fed to the summarizer
+SUMMARY_WINDOW = 8
+
+
+class SummaryQueue:
+    """In-process summarization queue, deduped per (user_id, bot).
+
+    Jobs are optionally mirrored to the summary_jobs table so pending work
+    survives a restart. Several worker processes share that table, so a job
+    only runs in the process that claims its lease; jobs left unclaimed or
+    with an expired lease are recovered at start and every lease period.
+    """
+
+    def __init__(self, workers: int = SUMMARY_WORKERS, persist: bool = SUMMARY_PERSIST_JOBS):
+        self.workers = workers
+        self.persist = persist
+        self.owner = None
+        self._queue = asyncio.Queue()
+        self._pending = set()
+        self._tasks = []
+
+    async def start(self):
+        """Reload persisted jobs and spawn the worker tasks"""
+        # Set here, not at import: serve.py imports the app before forking its workers
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        if self.persist:
+            await self._recover()
+            self._tasks.append(asyncio.create_task(self._sweep()))
+        self._tasks += [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Cancel workers and release their leases; persisted jobs are picked up again"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.persist:
+            try:
+                async with AsyncSessionLocal() as db:
+                    await db.execute(
+                        update(SummaryJob).where(SummaryJob.claimed_by == self.owner).values(claimed_by=None, claimed_at=None)
+                    )
+                    await db.commit()
+            except Exception as e:
+                print(f"Releasing summary job leases failed, they expire in {SUMMARY_LEASE_SECONDS:.0f}s: {e}")
+
+    def depth(self) -> int:
+        """Jobs queued, running or waiting out a retry backoff"""
+        return len(self._pending)
+
+    async def enqueue(self, user_id: int, bot: str):
+        """Schedule a summary refresh; a no-op if one is already pending"""
+        key = (user_id, bot)
+        if key in self._pending:
+            return
+        # Claim the key before awaiting so concurrent callers dedupe
+        self._pending.add(key)
+        if self.persist:
+            async with AsyncSessionLocal() as db:
+                existing = await db.scalar(
+                    select(SummaryJob).where(SummaryJob.user_id == user_id, SummaryJob.bot == bot)
+                )
+                if not existing:
+                    db.add(SummaryJob(user_id=user_id, bot=bot))
+                    try:
+                        await db.commit()
+                    except IntegrityError:
+                        pass  # another worker persisted the same job first; the lease decides who runs it
+        self._put(key, 0)
+
+    def _put(self, key, attempts):
+        self._pending.add(key)
+        self._queue.put_nowait((key, attempts))
+
+    async def _worker(self):
+        while True:
+            key, attempts = await self._queue.get()
+            try:
+                await self._run(key, attempts)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, key, attempts):
+        user_id, bot = key
+        try:
+            if not await self._claim(key):
+                # Running in another process, or already done
+                self._pending.discard(key)
+                return
+            await generate_summary(user_id, bot)
+        except Exception as summary_error:
+            attempts += 1
+            if attempts < SUMMARY_MAX_ATTEMPTS:
+                # Exponential backoff with jitter, without holding a worker slot
+                delay = SUMMARY_RETRY_BASE_SECONDS * (2 ** (attempts - 1)) * random.uniform(0.5, 1.5)
+                print(f"Auto-summary failed (attempt {attempts}), retrying in {delay:.1f}s: {summary_error}")
+                await self._record_attempt(key, attempts)
+                asyncio.get_running_loop().call_later(delay, self._queue.put_nowait, (key, attempts))
+                return
+            print(f"Auto-summary failed, giving up after {attempts} attempts: {summary_error}")
+        self._pending.discard(key)
+        await self._finish(key)
+
+    async def _claim(self, key) -> bool:
+        """Take or renew the job's lease; False if another live process holds it or the job is gone"""
+        if not self.persist:
+            return True
+        now = datetime.utcnow()
+        async with AsyncSessionLocal() as db:
+            claimed = await db.scalar(
+                update(SummaryJob).where(
+                    SummaryJob.user_id == key[0], SummaryJob.bot == key[1],
+                    or_(
+                        SummaryJob.claimed_by.is_(None),
+                        SummaryJob.claimed_by == self.owner,
+                        SummaryJob.claimed_at < now - timedelta(seconds=SUMMARY_LEASE_SECONDS)
+                    )
+                ).values(claimed_by=self.owner, claimed_at=now).returning(SummaryJob.id)
+            )
+            await db.commit()
+        return claimed is not None
+
+    async def _recover(self):
+        """Queue persisted jobs no live process holds: unclaimed ones and expired leases"""
+        cutoff = datetime.utcnow() - timedelta(seconds=SUMMARY_LEASE_SECONDS)
+        async with AsyncSessionLocal() as db:
+            jobs = await db.scalars(
+                select(SummaryJob).where(or_(SummaryJob.claimed_by.is_(None), SummaryJob.claimed_at < cutoff))
+                .order_by(SummaryJob.created_at)
+            )
+            for job in jobs:
+                if (job.user_id, job.bot) not in self._pending:
+                    self._put((job.user_id, job.bot), job.attempts or 0)
+
+    async def _sweep(self):
+        while True:
+            await asyncio.sleep(SUMMARY_LEASE_SECONDS)
+            try:
+                await self._recover()
+            except Exception as e:
+                print(f"Summary job recovery failed: {e}")
+
+    async def _record_attempt(self, key, attempts):
+        if not self.persist:
+            return
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(SummaryJob).where(
+                    SummaryJob.user_id == key[0], SummaryJob.bot == key[1]
+                ).values(attempts=attempts)
+            )
+            await db.commit()
+
+    async def _finish(self, key):
+        if not self.persist:
+            return
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(SummaryJob).where(
+                SummaryJob.user_id == key[0], SummaryJob.bot == key[1], SummaryJob.claimed_by == self.owner
+            ))
+            await db.commit()
+
+
+async def generate_summary(user_id: int, bot: str):
+    """Summarize the latest messages for (user_id, bot) and store the result"""
+    async with AsyncSessionLocal() as db:
+        summary_chats = (await db.scalars(
+            select(Chat).where(
+                Chat.user_id == user_id,
+                Chat.bot == bot
+            ).order_by(Chat.timestamp.desc()).limit(SUMMARY_WINDOW)
+        )).all()
+    if not summary_chats:
+        return
+    summary_chats.reverse()
+
+    # No session is held across the gateway wait and the LLM call, so the pool stays free.
+    # Shares the user's fair-queue slot budget with their chat requests
+    async with llm_gateway.slot(user_id):
+        with timed("summarization"):
+            summary_text = await summarize_conversation(bot, summary_chats)
+
+    summary = Summary(user_id=user_id, bot=bot, summary_text=summary_text, embedding=encode_embedding(summary_text))
+    async with AsyncSessionLocal() as db:
+        db.add(summary)
+        generation = await bump_generation(db, user_id, bot)
+        await db.commit()
+    context_cache.add_summary(user_id, bot, summary, generation)
+    memory_index.add_summary(user_id, bot, summary, generation)
+
+
+summary_queue = SummaryQueue()
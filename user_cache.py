@@ -0,0 +1,60 @@
+import os
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+# Cache settings (overridable via environment)
+USER_CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", 10000))
+USER_CACHE_TTL_SECONDS = float(os.environ.get("USER_CACHE_TTL_SECONDS", 300))
+
+
+class UserSnapshot(NamedTuple):
+    """Immutable, session-free view of the fields request handlers need"""
+    id: int
+    username: str
+    full_name: str
+    has_assessment: bool
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(
+            id=user.id,
+            username=user.username,
+            full_name=user.full_name,
+            has_assessment=bool(user.assessment_data)
+        )
+
+
+class UserCache:
+    """Bounded LRU of UserSnapshots keyed by token subject, with a TTL per entry"""
+
+    def __init__(self, maxsize: int = USER_CACHE_SIZE, ttl: float = USER_CACHE_TTL_SECONDS):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+
+    def get(self, subject: str) -> Optional[UserSnapshot]:
+        entry = self._entries.get(subject)
+        if entry is None:
+            return None
+        snapshot, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[subject]
+            return None
+        self._entries.move_to_end(subject)
+        return snapshot
+
+    def put(self, subject: str, snapshot: UserSnapshot):
+        self._entries[subject] = (snapshot, time.monotonic() + self.ttl)
+        self._entries.move_to_end(subject)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, subject: str):
+        self._entries.pop(subject, None)
+
+    def clear(self):
+        self._entries.clear()
+
+
+user_cache = UserCache()